@@ -0,0 +1,74 @@
+"""投稿の保持形式ごとのメモリ量の比較（1万件）
+
+従来の辞書（時刻をdatetimeに変換済み）と、共有ストアで使うPostRecord（__slots__・文字列のintern・
+エポック秒のみ）を比べる。GASから受け取ったJSONを読み込んだ直後と同じ状態で計測する。
+
+実行方法: python benchmark_post_records.py [件数]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from memory_report import format_bytes
+from post_record import PostRecord
+from post_store import normalize_post_times, to_records
+
+EMOTIONS = [
+    ('😊 とても満足', '#28a745'), ('🙂 満足', '#17a2b8'), ('😐 普通', '#6c757d'),
+    ('😕 やや不満', '#fd7e14'), ('😞 不満', '#dc3545'),
+]
+MODELS = ['Gemini 2.5', 'Gemini 2.0', '基本分析', 'ローカル分析']
+
+
+def make_wire_json(count):
+    """GASの応答と同じJSON文字列（同じ文字列も1件ずつ別のオブジェクトとして読み込まれる）"""
+    base = datetime(2025, 8, 16, 9, 0, 0)
+    posts = []
+    for i in range(count):
+        emotion, color = random.choice(EMOTIONS)
+        posts.append({
+            'user': f'来場者{i}',
+            'text': '模擬授業がとても楽しかったです。先輩も優しかった',
+            'sentiment': random.randint(0, 100),
+            'emotion': emotion,
+            'reason': '楽しさと満足感が表れている',
+            'keywords': ['模擬授業', '楽しい', '先輩'],
+            'model_used': random.choice(MODELS),
+            'time': (base + timedelta(seconds=i * 3)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'color': color,
+            'hash': f'{i:032x}',
+        })
+    return json.dumps(posts, ensure_ascii=False)
+
+
+def measure(build, wire_json):
+    """build(JSON文字列)で作った投稿の保持に必要なメモリと所要時間"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    posts = build(wire_json)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return posts, retained, elapsed
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    wire_json = make_wire_json(count)
+
+    dicts, dict_bytes, dict_time = measure(lambda data: normalize_post_times(json.loads(data)), wire_json)
+    records, record_bytes, record_time = measure(lambda data: to_records(json.loads(data)), wire_json)
+
+    start = time.perf_counter()
+    wire = [record.to_wire() for record in records]
+    to_wire_time = time.perf_counter() - start
+    assert PostRecord.from_wire(normalize_post_times(wire[:1])[0]) == records[0]
+
+    print(f"投稿数: {count}件")
+    print(f"辞書（従来）:  {format_bytes(dict_bytes)}  読み込み {dict_time * 1000:.0f} ms")
+    print(f"PostRecord:    {format_bytes(record_bytes)}  読み込み {record_time * 1000:.0f} ms")
+    print(f"削減量: {format_bytes(dict_bytes - record_bytes)}（{1 - record_bytes / dict_bytes:.0%}）")
+    print(f"to_wire（JSON用の辞書へ戻す）: {to_wire_time * 1000:.0f} ms")
@@ -0,0 +1,83 @@
+"""投稿時刻の変換処理のベンチマーク（1万件）
+
+従来の1件ずつの解析（load_postsでの変換 + 表示時の再変換）と、
+取り込み時に1回だけ行うまとめて変換（post_store.normalize_post_times）を比較する。
+
+実行方法: python benchmark_post_times.py [件数]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from post_store import normalize_post_times
+
+
+def make_posts(count):
+    """Google Sheetsから返ってくる複数フォーマットの時刻を含むダミー投稿"""
+    base = datetime(2025, 8, 16, 9, 0, 0)
+    formats = [
+        lambda t: t.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        lambda t: t.isoformat(),
+        lambda t: t.strftime('%Y/%m/%d %H:%M:%S'),
+        lambda t: t.strftime('%m/%d/%Y %H:%M:%S'),
+    ]
+    return [
+        {
+            'user': f'user{i}',
+            'text': '模擬授業が楽しかった',
+            'sentiment': random.randint(0, 100),
+            'time': random.choice(formats)(base + timedelta(seconds=i * 3))
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_parse(time_value):
+    """従来のload_postsと同じ1件ずつの解析"""
+    try:
+        time_str = time_value.replace('Z', '')
+        if 'T' in time_str:
+            if '.' in time_str:
+                return datetime.fromisoformat(time_str.split('.')[0])
+            return datetime.fromisoformat(time_str)
+        if '/' in time_str and ' ' in time_str:
+            try:
+                return datetime.strptime(time_str, '%Y/%m/%d %H:%M:%S')
+            except ValueError:
+                return datetime.strptime(time_str, '%m/%d/%Y %H:%M:%S')
+        return datetime.fromisoformat(time_str)
+    except Exception:
+        return datetime.now()
+
+
+def run_legacy(posts):
+    for post in posts:
+        post['time'] = legacy_parse(post['time'])
+    # 表示時の再ソート（従来は毎回の画面更新で実行）
+    sorted(posts, key=lambda x: x['time'], reverse=True)[:10]
+
+
+def run_vectorized(posts):
+    normalize_post_times(posts)
+    sorted(posts, key=lambda x: x['epoch'], reverse=True)[:10]
+
+
+def measure(func, count, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        posts = make_posts(count)
+        start = time.perf_counter()
+        func(posts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    legacy = measure(run_legacy, count)
+    vectorized = measure(run_vectorized, count)
+    print(f"投稿数: {count}件")
+    print(f"従来（1件ずつ解析）: {legacy * 1000:.1f} ms")
+    print(f"まとめて変換:        {vectorized * 1000:.1f} ms")
+    print(f"速度比: {legacy / vectorized:.1f}倍")
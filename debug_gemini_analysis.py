@@ -3,8 +3,11 @@ import pandas as pd
 import plotly.express as px
 from datetime import datetime
 import json
-import requests
+from gas_client import GasClient, response_version
+from post_export import EXPORT_FORMATS, export_callable
+from post_store import SingleFlightLoader
 import time
+import random
 import google.generativeai as genai
 import traceback
 
@@ -14,6 +17,9 @@ st.set_page_config(page_title="オープンキャンパス感想SNS", page_icon=
 # セッション状態の初期化
 if 'last_update' not in st.session_state:
     st.session_state.last_update = datetime.now()
+if 'update_interval' not in st.session_state:
+    # 自動更新の間隔はセッションごとにずらす（全員が同時にGASへ問い合わせないように）
+    st.session_state.update_interval = random.uniform(24, 36)
 if 'is_posting' not in st.session_state:
     st.session_state.is_posting = False
 if 'show_success' not in st.session_state:
@@ -284,35 +290,71 @@ def simple_sentiment_analysis_fallback(text):
 # Google Apps Script URL
 GAS_URL = st.secrets.get("gas_url", "")
 
-@st.cache_data(ttl=30)
-def load_posts():
-    """投稿を読み込み（キャッシュ付き）"""
+@st.cache_resource
+def get_gas_client():
+    """GAS通信用の共有クライアント（接続を使い回す）"""
+    return GasClient(
+        pool_size=int(st.secrets.get("gas_pool_size", 10)),
+        max_retries=int(st.secrets.get("gas_max_retries", 3)),
+        backoff_factor=float(st.secrets.get("gas_backoff_factor", 0.5))
+    )
+
+# データバージョンの確認間隔（秒）。バージョン非対応のGASでは従来どおり30秒ごとに投稿を取り直す
+VERSION_CHECK_INTERVAL = 5
+
+@st.cache_data(ttl=VERSION_CHECK_INTERVAL, show_spinner=False)
+def fetch_data_version():
+    """GASのデータバージョン（全セッション共有。非対応・通信エラーなら30秒ごとに変わる値）"""
+    if GAS_URL:
+        try:
+            version = get_gas_client().data_version(GAS_URL, timeout=5)
+            if version is not None:
+                return version
+        except Exception:
+            pass
+    return f"t{int(time.time() // 30)}"
+
+def refresh_posts():
+    """次の読み込みで最新を確認（バージョン非対応のGASでは投稿を取り直す）"""
+    fetch_data_version.clear()
+    if GAS_URL and not get_gas_client().supports_version(GAS_URL):
+        get_post_loader().invalidate()
+
+def fetch_posts():
+    """GASから全投稿を取得し、時刻をdatetimeに変換（失敗時は例外）"""
+    response = get_gas_client().get(GAS_URL, timeout=5)
+    response.raise_for_status()
+    posts = response.json()
+    for post in posts:
+        if post.get('time'):
+            try:
+                if isinstance(post['time'], str):
+                    time_str = post['time'].replace('Z', '')
+                    if '.' in time_str:
+                        post['time'] = datetime.fromisoformat(time_str.split('.')[0])
+                    else:
+                        post['time'] = datetime.fromisoformat(time_str)
+                elif not isinstance(post['time'], datetime):
+                    post['time'] = datetime.now()
+            except:
+                post['time'] = datetime.now()
+        else:
+            post['time'] = datetime.now()
+    return tuple(posts)
+
+@st.cache_resource
+def get_post_loader():
+    """GASからの読み込みを1つにまとめるローダー（全セッション共有。取得中は他のセッションに前回の投稿を返す）"""
+    return SingleFlightLoader(fetch_posts)
+
+def load_posts(version):
+    """投稿を読み込み（versionが変わったときだけ1セッションが取得する。返り値は共有されるため変更しないこと）"""
     if not GAS_URL:
-        return st.session_state.get('posts', [])
-    
+        return tuple(st.session_state.get('posts', []))
     try:
-        response = requests.get(GAS_URL, timeout=5)
-        if response.status_code == 200:
-            posts = response.json()
-            for post in posts:
-                if post.get('time'):
-                    try:
-                        if isinstance(post['time'], str):
-                            time_str = post['time'].replace('Z', '')
-                            if '.' in time_str:
-                                post['time'] = datetime.fromisoformat(time_str.split('.')[0])
-                            else:
-                                post['time'] = datetime.fromisoformat(time_str)
-                        elif not isinstance(post['time'], datetime):
-                            post['time'] = datetime.now()
-                    except:
-                        post['time'] = datetime.now()
-                else:
-                    post['time'] = datetime.now()
-            return posts
-        return []
-    except:
-        return st.session_state.get('posts', [])
+        return get_post_loader().get(version)
+    except Exception:
+        return tuple(st.session_state.get('posts', []))
 
 def save_post(nickname, text, score, emotion, reason, keywords, color):
     """投稿を保存（非同期対応）"""
@@ -329,10 +371,14 @@ def save_post(nickname, text, score, emotion, reason, keywords, color):
     
     if GAS_URL:
         try:
-            response = requests.post(GAS_URL, json=post_data, timeout=5)
+            response = get_gas_client().post(GAS_URL, json=post_data, timeout=5)
             success = response.status_code == 200
             if success:
-                load_posts.clear()
+                # 全件を取り直さず、読み込み済みの投稿に自分の投稿を加えて表示する
+                version = response_version(response)
+                get_post_loader().insert(dict(post_data, time=datetime.now()), key=version)
+                if version is not None:
+                    fetch_data_version.clear()  # 投稿後のバージョンで確認する（間に他の書き込みがあればローダーが取り直す）
             return success
         except:
             return False
@@ -348,14 +394,14 @@ def clear_all_posts():
     if GAS_URL:
         try:
             clear_url = GAS_URL + "?action=clear"
-            response = requests.get(clear_url, timeout=10)
+            response = get_gas_client().get(clear_url, timeout=10)
             
             if response.status_code == 200:
                 if 'posts' in st.session_state:
                     del st.session_state['posts']
                 if 'confirm_clear' in st.session_state:
                     del st.session_state['confirm_clear']
-                load_posts.clear()
+                refresh_posts()
                 return True
             return False
         except:
@@ -430,12 +476,12 @@ with st.sidebar:
     
     # 手動更新ボタン
     if st.button("🔄 今すぐ更新", use_container_width=True):
-        load_posts.clear()
+        refresh_posts()
         st.session_state.last_update = datetime.now()
         st.rerun()
     
     st.markdown("## 📊 現在の状況")
-    posts = load_posts()
+    posts = load_posts(fetch_data_version())
     total_posts = len(posts)
     st.metric("参加者の感想", f"{total_posts}件")
     
@@ -480,12 +526,16 @@ with st.sidebar:
         
         # データエクスポート
         if posts:
-            export_data = json.dumps(posts, ensure_ascii=False, indent=2, default=str)
+            # ボタンが押されたときにだけファイルを作成
+            export_format = st.selectbox(
+                "ファイル形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+            )
+            _, export_mime, export_extension = EXPORT_FORMATS[export_format]
             st.download_button(
                 "📄 感想データをダウンロード",
-                data=export_data,
-                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                mime="application/json"
+                data=export_callable(posts, export_format),
+                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}{export_extension}",
+                mime=export_mime
             )
 
 # 左右のレイアウト
@@ -635,8 +685,8 @@ with right_col:
 # 自動更新処理（非ブロッキング）
 if st.session_state.auto_update_enabled:
     time_since_update = (datetime.now() - st.session_state.last_update).total_seconds()
-    if time_since_update >= 30:
-        load_posts.clear()
+    if time_since_update >= st.session_state.update_interval:
+        refresh_posts()
         st.session_state.last_update = datetime.now()
         st.info("🔄 新しい感想をチェック中...")
         time.sleep(1)
@@ -0,0 +1,172 @@
+"""投稿の重複チェック用インデックス（全セッション共有）
+
+直近の投稿ハッシュは集合で正確に保持し、それ以前のものはBloomフィルタで判定する。
+Bloomフィルタは「含まれない」は確実で、「含まれる」はまれに誤判定（偽陽性）がある。
+インデックスはローカルファイルに保存し、起動時にはGASの投稿からも作り直す。
+ファイルの中身は、形式のバージョン・ビット数・ハッシュ数・直近のハッシュ（JSONの1行）と
+ビット配列を並べてzlibで圧縮したもの。
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import zlib
+
+# インデックスファイルの形式のバージョン（形式を変えたら増やす。違うファイルは読み込まずに作り直す）
+INDEX_FORMAT_VERSION = 1
+
+
+class BloomFilter:
+    """ビット配列によるBloomフィルタ"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # 想定件数と誤判定率から最適なビット数・ハッシュ数を決める
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # 2つのハッシュ値の組み合わせでk個の位置を作る（double hashing）
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        """追加（新しく追加された場合はTrue）"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item):
+        return all(self.bits[p // 8] & (1 << (p % 8)) for p in self._positions(item))
+
+    def false_positive_rate(self):
+        """現在の件数での推定偽陽性率"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class PostDedupIndex:
+    """直近の完全一致集合 + 全件のBloomフィルタ（スレッドセーフ）"""
+
+    def __init__(self, path=None, capacity=100000, error_rate=0.001, recent_size=5000, save_interval=30):
+        self.path = path
+        self.recent_size = recent_size
+        self.save_interval = save_interval
+        self._recent = {}  # ハッシュ -> None（追加順）
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._last_saved = time.time()
+        self._dirty = False
+        self.probable_hits = 0  # Bloomフィルタだけで重複と判定した回数
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                header, _, bits = zlib.decompress(f.read()).partition(b'\n')
+            meta = json.loads(header)
+        except (OSError, zlib.error, ValueError):
+            return  # 壊れている場合は作り直す（GASの投稿から再構築される）
+        bloom = self._bloom
+        # 形式やパラメータ（ビット数・ハッシュ数）が違うファイルは使わない
+        if (not isinstance(meta, dict) or meta.get('format') != INDEX_FORMAT_VERSION
+                or meta.get('num_bits') != bloom.num_bits or meta.get('num_hashes') != bloom.num_hashes
+                or len(bits) != len(bloom.bits)):
+            return
+        bloom.bits = bytearray(bits)
+        bloom.count = int(meta.get('count', 0))
+        self._recent = dict.fromkeys(meta.get('recent', [])[-self.recent_size:])
+
+    def save(self):
+        """ファイルに保存（一時ファイルに書いてから置き換える）"""
+        if not self.path:
+            return
+        with self._lock:
+            header = json.dumps({
+                'format': INDEX_FORMAT_VERSION,
+                'num_bits': self._bloom.num_bits,
+                'num_hashes': self._bloom.num_hashes,
+                'count': self._bloom.count,
+                'recent': list(self._recent)
+            }).encode('utf-8')
+            data = zlib.compress(header + b'\n' + bytes(self._bloom.bits), 6)
+            self._dirty = False
+            self._last_saved = time.time()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _remember(self, post_hash):
+        self._recent[post_hash] = None
+        if len(self._recent) > self.recent_size:
+            del self._recent[next(iter(self._recent))]
+        if self._bloom.add(post_hash):
+            self._dirty = True
+
+    def _maybe_save(self):
+        if self._dirty and time.time() - self._last_saved >= self.save_interval:
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def add_many(self, post_hashes):
+        """既存の投稿のハッシュを登録（起動時の再構築・同期時の追加）"""
+        with self._lock:
+            for post_hash in post_hashes:
+                if post_hash:
+                    self._remember(post_hash)
+        self._maybe_save()
+
+    def contains(self, post_hash):
+        """登録済み（またはその可能性が高い）ならTrue"""
+        with self._lock:
+            if post_hash in self._recent:
+                return True
+            if post_hash in self._bloom:
+                self.probable_hits += 1
+                return True
+        return False
+
+    def add(self, post_hash):
+        """受け付けた投稿のハッシュを登録（保存に成功してから呼ぶ）"""
+        self.add_many([post_hash])
+
+    def rebuild(self, post_hashes):
+        """空にしてからpost_hashesだけを登録し直す（全件クリア後など。Bloomフィルタからは削除できないため）"""
+        with self._lock:
+            self._recent = {}
+            self._bloom = BloomFilter(self._bloom.capacity, self._bloom.error_rate)
+            self.probable_hits = 0
+            for post_hash in post_hashes:
+                if post_hash:
+                    self._remember(post_hash)
+            self._dirty = True
+            self._last_saved = 0.0  # 古い内容のファイルを残さないようすぐ保存する
+        self._maybe_save()
+
+    def stats(self):
+        """件数と推定偽陽性率"""
+        with self._lock:
+            return {
+                'recent': len(self._recent),
+                'total': self._bloom.count,
+                'false_positive_rate': self._bloom.false_positive_rate(),
+                'probable_hits': self.probable_hits
+            }
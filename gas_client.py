@@ -0,0 +1,110 @@
+"""Google Apps Script（GAS）通信用の共有HTTPクライアント
+
+毎回 requests.get / requests.post を呼ぶとTCP+TLS接続を作り直すため、
+接続プールを持つアダプタを1つだけ作り、全スレッドで使い回す。
+アプリ側では st.cache_resource で1つだけ作って共有する。
+"""
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 一時的なエラーとみなすHTTPステータス（GASの同時実行エラー・レート制限など）
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def response_version(response):
+    """POSTの応答に含まれる投稿後のデータバージョン（含まれていなければNone）"""
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    version = data.get('version') if isinstance(data, dict) else None
+    return str(version) if version is not None else None
+
+
+class JitterRetry(Retry):
+    """指数バックオフにランダムな揺らぎを加えたリトライ（全員が同時に再送しないように）"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return random.uniform(backoff / 2, backoff)
+
+
+class GasClient:
+    """接続プール・リトライ・タイムアウト付きのGASクライアント（スレッドセーフ）"""
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_factor=0.5, timeout=10):
+        self.timeout = timeout
+        retry = JitterRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            # POSTは読み込みタイムアウトや5xxでは再送しない（GASが書き込み済みだと行が重複するため）。
+            # 接続できなかった場合だけは送信前なので再送する。POSTの再送はpost_id付きのアウトボックスが行う
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False  # 最後の応答をそのまま返し、呼び出し側でstatus_codeを判定する
+        )
+        # アダプタ（接続プール）は全スレッドで共有し、Sessionはスレッドごとに持つ
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._local = threading.local()
+        self._no_version = set()  # ?action=version に対応していないGASのURL
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, params=None, timeout=None):
+        """GETリクエスト（timeout未指定時は既定値）"""
+        return self._session().get(url, params=params, timeout=timeout or self.timeout)
+
+    def post(self, url, json=None, timeout=None):
+        """POSTリクエスト（timeout未指定時は既定値。接続エラー以外では再送しない）"""
+        return self._session().post(url, json=json, timeout=timeout or self.timeout)
+
+    def data_version(self, url, params=None, timeout=None):
+        """GASのデータバージョン（?action=version の {"version": ...}。非対応のGASならNone）
+
+        非対応のGASは代わりに全投稿を返すため、一度非対応と分かったURLには以後問い合わせない。
+        通信エラーは例外のまま返す。
+        """
+        if url in self._no_version:
+            return None
+        response = self.get(url, params=dict(params or {}, action='version'), timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict) and data.get('version') is not None:
+            return str(data['version'])
+        self._no_version.add(url)
+        return None
+
+    def supports_version(self, url):
+        """data_versionが使えるか（まだ問い合わせていなければTrue）"""
+        return url not in self._no_version
+
+    def metrics(self):
+        """接続の再利用状況（新規接続数・リクエスト数・再利用率）"""
+        connections = 0
+        requests_sent = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_sent += pool.num_requests
+        reuse_rate = 1 - connections / requests_sent if requests_sent else 0.0
+        return {
+            'connections': connections,
+            'requests': requests_sent,
+            'reuse_rate': max(0.0, reuse_rate)
+        }
@@ -2,9 +2,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
-import json
-import requests
+from gas_client import GasClient
+from post_export import EXPORT_FORMATS, export_callable
+from post_store import SingleFlightLoader
 import time
+import random
 
 # ページ設定
 st.set_page_config(page_title="オープンキャンパス感想SNS", page_icon="🎓", layout="wide")
@@ -49,37 +51,56 @@ def simple_sentiment_analysis(text):
 # Google Apps Script URL（秘密の設定から取得）
 GAS_URL = st.secrets.get("gas_url", "")
 
+@st.cache_resource
+def get_gas_client():
+    """GAS通信用の共有クライアント（接続を使い回す）"""
+    return GasClient(
+        pool_size=int(st.secrets.get("gas_pool_size", 10)),
+        max_retries=int(st.secrets.get("gas_max_retries", 3)),
+        backoff_factor=float(st.secrets.get("gas_backoff_factor", 0.5))
+    )
+
+# 投稿の再取得間隔（秒）。この間は全セッションで同じ投稿を使う
+POSTS_REFRESH_SECONDS = 10
+
+def fetch_posts():
+    """GASから全投稿を取得し、時刻をdatetimeに変換（失敗時は例外）"""
+    response = get_gas_client().get(GAS_URL, timeout=10)
+    response.raise_for_status()
+    posts = response.json()
+    # 時刻データを変換
+    for post in posts:
+        if post.get('time'):
+            try:
+                # ISO形式の文字列をdatetimeに変換
+                if isinstance(post['time'], str):
+                    # 'Z'が含まれる場合は除去
+                    time_str = post['time'].replace('Z', '')
+                    # ミリ秒が含まれる場合の対応
+                    if '.' in time_str:
+                        post['time'] = datetime.fromisoformat(time_str.split('.')[0])
+                    else:
+                        post['time'] = datetime.fromisoformat(time_str)
+                elif not isinstance(post['time'], datetime):
+                    post['time'] = datetime.now()
+            except:
+                post['time'] = datetime.now()
+        else:
+            post['time'] = datetime.now()
+    return tuple(posts)
+
+@st.cache_resource
+def get_post_loader():
+    """GASからの読み込みを1つにまとめるローダー（全セッション共有。取得中は他のセッションに前回の投稿を返す）"""
+    return SingleFlightLoader(fetch_posts)
+
 def load_posts():
-    """投稿を読み込み"""
+    """投稿を読み込み（POSTS_REFRESH_SECONDS秒に1回だけ1セッションが取得する。返り値は共有されるため変更しないこと）"""
     if not GAS_URL:
         return st.session_state.get('posts', [])
-    
     try:
-        response = requests.get(GAS_URL, timeout=10)
-        if response.status_code == 200:
-            posts = response.json()
-            # 時刻データを変換
-            for post in posts:
-                if post.get('time'):
-                    try:
-                        # ISO形式の文字列をdatetimeに変換
-                        if isinstance(post['time'], str):
-                            # 'Z'が含まれる場合は除去
-                            time_str = post['time'].replace('Z', '')
-                            # ミリ秒が含まれる場合の対応
-                            if '.' in time_str:
-                                post['time'] = datetime.fromisoformat(time_str.split('.')[0])
-                            else:
-                                post['time'] = datetime.fromisoformat(time_str)
-                        elif not isinstance(post['time'], datetime):
-                            post['time'] = datetime.now()
-                    except:
-                        post['time'] = datetime.now()
-                else:
-                    post['time'] = datetime.now()
-            return posts
-        return []
-    except:
+        return get_post_loader().get(int(time.time() // POSTS_REFRESH_SECONDS))
+    except Exception:
         return st.session_state.get('posts', [])
 
 def save_post(nickname, text, score, emotion, color):
@@ -95,8 +116,12 @@ def save_post(nickname, text, score, emotion, color):
     
     if GAS_URL:
         try:
-            response = requests.post(GAS_URL, json=post_data, timeout=10)
-            return response.status_code == 200
+            response = get_gas_client().post(GAS_URL, json=post_data, timeout=10)
+            success = response.status_code == 200
+            if success:
+                # 全件を取り直さず、読み込み済みの投稿に自分の投稿を加えて表示する
+                get_post_loader().insert(dict(post_data, time=datetime.now()))
+            return success
         except:
             return False
     else:
@@ -113,7 +138,7 @@ def clear_all_posts():
         try:
             # Google Sheetsのデータを削除するための特別なリクエスト
             clear_url = GAS_URL + "?action=clear"
-            response = requests.get(clear_url, timeout=10)
+            response = get_gas_client().get(clear_url, timeout=10)
             
             # 成功した場合、ローカルのSession Stateもクリア
             if response.status_code == 200:
@@ -122,6 +147,7 @@ def clear_all_posts():
                 # 確認フラグもリセット
                 if 'confirm_clear' in st.session_state:
                     del st.session_state['confirm_clear']
+                get_post_loader().invalidate()
                 return True
             return False
         except:
@@ -145,13 +171,15 @@ else:
 
 # 自動更新
 auto_update = st.checkbox("🔄 自動更新（10秒ごと）", value=True)
+if 'update_interval' not in st.session_state:
+    # 更新間隔はセッションごとにずらす（全員が同時に再読み込みしないように）
+    st.session_state.update_interval = random.uniform(8, 12)
+# 自動更新では集計と投稿一覧のフラグメントだけを再実行する（入力中のフォームは中断しない）
+refresh_every = st.session_state.update_interval if auto_update else None
 
-# 管理者用データクリア機能（サイドバーに配置）
-with st.sidebar:
-    st.markdown("## 🎯 オープンキャンパス感想SNS")
-    st.markdown("みなさんの率直な感想をお聞かせください！")
-    
-    st.markdown("## 📊 現在の状況")
+@st.fragment(run_every=refresh_every)
+def show_status():
+    """サイドバーの現在の状況"""
     posts = load_posts()
     total_posts = len(posts)
     st.metric("参加者の感想", f"{total_posts}件")
@@ -162,6 +190,14 @@ with st.sidebar:
         
         positive_count = len([p for p in posts if p['sentiment'] >= 60])
         st.metric("満足した人", f"{positive_count}人")
+
+# 管理者用データクリア機能（サイドバーに配置）
+with st.sidebar:
+    st.markdown("## 🎯 オープンキャンパス感想SNS")
+    st.markdown("みなさんの率直な感想をお聞かせください！")
+    
+    st.markdown("## 📊 現在の状況")
+    show_status()
     
     st.markdown("---")
     st.markdown("## ⚙️ 管理機能")
@@ -203,13 +239,18 @@ with st.sidebar:
                 st.rerun()
         
         # データエクスポート
+        posts = load_posts()
         if posts:
-            export_data = json.dumps(posts, ensure_ascii=False, indent=2, default=str)
+            # ボタンが押されたときにだけファイルを作成
+            export_format = st.selectbox(
+                "ファイル形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+            )
+            _, export_mime, export_extension = EXPORT_FORMATS[export_format]
             st.download_button(
                 "📄 感想データをダウンロード",
-                data=export_data,
-                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                mime="application/json"
+                data=export_callable(posts, export_format),
+                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}{export_extension}",
+                mime=export_mime
             )
     
     st.markdown("---")
@@ -295,13 +336,16 @@ with left_col:
                 st.error("❌ 投稿に失敗しました。もう一度お試しください。")
 
 # 右側：投稿一覧
-with right_col:
+@st.fragment(run_every=refresh_every)
+def show_posts():
+    """みんなの感想（統計・一覧・グラフ）"""
     st.subheader("🌟 みんなの感想")
     
-    # 更新ボタン
-    if st.button("🔄 最新の感想を見る"):
-        st.rerun()
+    # 更新ボタン（押すとこの一覧だけが再実行される）
+    st.button("🔄 最新の感想を見る")
     
+    posts = load_posts()
+    total_posts = len(posts)
     if posts:
         # 統計
         avg_score = sum(p['sentiment'] for p in posts) / total_posts
@@ -441,10 +485,8 @@ with right_col:
         どんな小さなことでも大歓迎です！
         """)
 
-# 自動更新
-if auto_update:
-    time.sleep(10)
-    st.rerun()
+with right_col:
+    show_posts()
 
 # フッター
 st.markdown("---")
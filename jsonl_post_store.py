@@ -0,0 +1,346 @@
+"""ローカル共有投稿の追記型ログストア（updated_app_code.py用・SQLiteを使わない場合）
+
+投稿は1件1行のJSONとしてログファイルの末尾に追記する（ファイルロック付き）。
+読み込み側は前回読んだ位置（バイトオフセット）を覚えておき、追記された分だけを読む。
+バックグラウンドでログをスナップショット＋インデックスにまとめ、ログを空にする（コンパクション）。
+保存期間を過ぎた投稿はコンパクションと同じ手順でスナップショットから取り除き、アーカイブ（post_archive.py）に移す。
+
+ファイル構成（path="shared_posts.jsonl" の場合）:
+- shared_posts.jsonl          : 1行目が {"generation": n}、2行目以降が追記された投稿
+- shared_posts.snapshot.jsonl : コンパクション済みの投稿（1件1行）
+- shared_posts.index.json     : スナップショットの世代・件数（ログの1行目の世代と照合する）と、
+                                スナップショットに取り込んだログのバイト数（ログを空にする前に止まった場合に続きから読む）
+"""
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windowsなどでは複数プロセス間のロックは行わない（同一プロセス内はスレッドロックで保護）
+    fcntl = None
+
+
+def _lock_file(f, exclusive):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _encode(post):
+    post = dict(post)
+    if isinstance(post.get('time'), datetime):
+        post['time'] = post['time'].isoformat()
+    return json.dumps(post, ensure_ascii=False) + '\n'
+
+
+def _decode(line):
+    post = json.loads(line)
+    post['time'] = datetime.fromisoformat(post['time'])
+    return post
+
+
+def _sort_key(post):
+    """ページングの並び順とcursor（時刻 → 名前 → 本文。コンパクションやアーカイブで変わらない）"""
+    return (post['time'], post['user'], post['text'])
+
+
+def _write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JsonlPostStore:
+    """追記型ログによる投稿の保存と問い合わせ（SQLitePostStoreと同じ使い方）"""
+
+    def __init__(self, path, positive_threshold=55):
+        base, _ = os.path.splitext(path)
+        self.path = path
+        self.snapshot_path = base + '.snapshot.jsonl'
+        self.index_path = base + '.index.json'
+        self.positive_threshold = positive_threshold
+        self._lock = threading.Lock()
+        self._compactor = None
+        if not os.path.exists(path):
+            self._create_log()
+        self._clear_cache()
+
+    def _create_log(self):
+        """1行目（世代）を書いたログファイルを作る（複数のプロセスが同時に起動しても1回だけ）"""
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'generation': self._index_generation()}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # 書き終えたファイルをリンクで置く（既にあれば失敗する。読み込み側が空のファイルを見ることもない）
+            os.link(tmp_path, self.path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    # --- 読み込み側の状態 ---
+
+    def _clear_cache(self):
+        self._posts = []  # _sort_keyの順
+        self._keys = []
+        self._generation = None
+        self._offset = 0
+        self._log_entries = 0  # 前回のコンパクション以降にログに追記された件数
+        self._sentiment_sum = 0.0
+        self._positive = 0
+        self._emotion_counts = {}
+
+    def _remember(self, post):
+        key = _sort_key(post)
+        if not self._keys or key >= self._keys[-1]:
+            self._posts.append(post)
+            self._keys.append(key)
+        else:
+            # 時刻が前後して追記された投稿（他のプロセスの時計のずれなど）
+            position = bisect.bisect_right(self._keys, key)
+            self._posts.insert(position, post)
+            self._keys.insert(position, key)
+        self._sentiment_sum += post['sentiment']
+        if post['sentiment'] > self.positive_threshold:
+            self._positive += 1
+        emotion = post.get('emotion')
+        self._emotion_counts[emotion] = self._emotion_counts.get(emotion, 0) + 1
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            index['generation']
+            return index
+        except (OSError, ValueError, KeyError, TypeError):
+            return {'generation': 0}
+
+    def _index_generation(self):
+        return self._read_index()['generation']
+
+    def _load_snapshot(self):
+        # ロックを持った状態で呼ぶ（コンパクション中は読まない）
+        self._clear_cache()
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._remember(_decode(line))
+        return self._read_index()
+
+    def _refresh(self):
+        """ログに追記された分だけを読み込む（コンパクションされていればスナップショットから読み直す）"""
+        with open(self.path, 'rb') as f:
+            _lock_file(f, exclusive=False)
+            try:
+                header = f.readline()
+                log_generation = json.loads(header)['generation']
+                if log_generation != self._generation:
+                    index = self._load_snapshot()
+                    self._generation = log_generation
+                    self._offset = len(header)
+                    if index['generation'] > log_generation:
+                        # スナップショット作成後、ログを空にする前に中断された場合:
+                        # 取り込み済みの位置までは読み飛ばし、その後に追記された投稿だけを読む
+                        f.seek(0, os.SEEK_END)
+                        self._offset = min(index.get('log_offset', f.tell()), f.tell())
+                f.seek(self._offset)
+                tail = f.read()
+            finally:
+                _unlock_file(f)
+        # 書きかけの行は次回に回す
+        complete = tail[:tail.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._remember(_decode(line.decode('utf-8')))
+                self._log_entries += 1
+        self._offset += len(complete)
+
+    # --- 書き込み ---
+
+    def add(self, post):
+        """投稿を1行追記する（ファイルロックで他のプロセスの追記と混ざらないようにする）"""
+        line = _encode(post)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            _lock_file(f, exclusive=True)
+            try:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                _unlock_file(f)
+        return True
+
+    def migrate_json(self, json_path):
+        """既存のJSONファイルを一度だけ取り込み、取り込んだ件数を返す
+
+        取り込み後のファイルは「.migrated」を付けて残す（2回目以降は何もしない）。
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(self.path, 'a', encoding='utf-8') as f:
+            _lock_file(f, exclusive=True)
+            try:
+                if not os.path.exists(json_path):
+                    return 0
+                with open(json_path, 'r', encoding='utf-8') as source:
+                    posts = json.load(source)
+                f.write(''.join(_encode(post) for post in posts))
+                f.flush()
+                os.fsync(f.fileno())
+                os.replace(json_path, json_path + '.migrated')
+            finally:
+                _unlock_file(f)
+        return len(posts)
+
+    # --- 問い合わせ（SQLitePostStoreと同じ形で返す） ---
+
+    def latest(self, limit=8):
+        """新しい順にlimit件"""
+        return self.page(limit)[0]
+
+    def page(self, limit, cursor=None):
+        """cursorより古い投稿を新しい順にlimit件と、次のページのcursor（最後ならNone）
+
+        cursorは最後に返した投稿の (時刻, 名前, 本文)。位置ではないため、
+        コンパクションやアーカイブで古い投稿が減っても同じ続きを返す。
+        """
+        with self._lock:
+            self._refresh()
+            end = len(self._posts) if cursor is None else bisect.bisect_left(self._keys, tuple(cursor))
+            start = max(0, end - limit)
+            posts = self._posts[start:end][::-1]
+            next_cursor = self._keys[start] if start > 0 else None
+        return posts, next_cursor
+
+    def stats(self, positive_threshold=None):
+        """件数・平均スコア・ポジティブ件数"""
+        with self._lock:
+            self._refresh()
+            total = len(self._posts)
+            if positive_threshold is None or positive_threshold == self.positive_threshold:
+                positive = self._positive
+            else:
+                positive = sum(1 for post in self._posts if post['sentiment'] > positive_threshold)
+            average = self._sentiment_sum / total if total else 0.0
+        return {'total': total, 'average': average, 'positive': positive}
+
+    def emotion_counts(self):
+        """感情ごとの件数（多い順）"""
+        with self._lock:
+            self._refresh()
+            counts = dict(self._emotion_counts)
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    def sentiment_history(self):
+        """グラフ用の投稿順のスコア（本文などの表示に必要な列だけ）"""
+        with self._lock:
+            self._refresh()
+            posts = list(self._posts)
+        return [{'user': p['user'], 'text': p['text'], 'sentiment': p['sentiment']} for p in posts]
+
+    # --- コンパクション ---
+
+    def compact(self):
+        """ログの内容をスナップショットに移してログを空にし、移した件数を返す"""
+        return self._compact()[0]
+
+    def archive_older_than(self, cutoff, archive):
+        """コンパクションし、cutoff（datetime）より前の投稿をarchive（PostArchive）に移して件数を返す"""
+        return self._compact(cutoff, archive)[1]
+
+    def _compact(self, cutoff=None, archive=None):
+        """(ログから移した件数, アーカイブに移した件数) を返す"""
+        with open(self.path, 'r+b') as f:
+            _lock_file(f, exclusive=True)
+            try:
+                header = f.readline()
+                log_generation = json.loads(header)['generation']
+                index = self._read_index()
+                snapshot_generation = index['generation']
+                entries = f.read()
+                entries = entries[:entries.rfind(b'\n') + 1]
+                consumed_bytes = len(entries)  # このコンパクションでスナップショットに取り込むログの範囲（ヘッダーの後から）
+                if snapshot_generation > log_generation:
+                    # 前回のコンパクションがログを空にする前に止まった: 取り込み済みの分を除き、
+                    # その後に追記された投稿だけを移す（位置が無い古いインデックスなら全部取り込み済みとみなす）
+                    consumed = index.get('log_offset', len(header) + len(entries)) - len(header)
+                    entries = entries[max(0, consumed):]
+                if not entries.strip() and cutoff is None and snapshot_generation <= log_generation:
+                    return 0, 0
+
+                # スナップショット = 既存のスナップショット + ログ（どちらも1件1行のJSON）
+                snapshot_lines = []
+                if os.path.exists(self.snapshot_path):
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as snapshot:
+                        snapshot_lines = snapshot.readlines()
+                new_lines = [line for line in entries.decode('utf-8').splitlines(keepends=True) if line.strip()]
+                lines = snapshot_lines + new_lines
+                archived = []
+                if cutoff is not None:
+                    kept = []
+                    for line in lines:
+                        post = _decode(line)
+                        if post['time'] < cutoff:
+                            archived.append(post)
+                        else:
+                            kept.append(line)
+                    if not archived and not new_lines:
+                        return 0, 0
+                    if archived:
+                        # 先にアーカイブへ書き込んでからスナップショットから除く（途中で止まっても失われない）
+                        archive.append(archived)
+                    lines = kept
+                generation = max(log_generation, snapshot_generation) + 1
+                _write_atomic(self.snapshot_path, ''.join(lines))
+                _write_atomic(self.index_path, json.dumps({
+                    'generation': generation,
+                    'count': len(lines),
+                    'compacted_at': time.time(),
+                    # 途中で止まった場合に、ログのどこまでをスナップショットに取り込んだか分かるように
+                    'log_offset': len(header) + consumed_bytes
+                }))
+
+                # ログを空にして世代を進める（読み込み側はスナップショットから読み直す）
+                f.seek(0)
+                f.truncate()
+                f.write((json.dumps({'generation': generation}) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                return len(new_lines), len(archived)
+            finally:
+                _unlock_file(f)
+
+    def start_compaction(self, interval=60, min_entries=200):
+        """ログがmin_entries件以上たまったらinterval秒ごとにコンパクションするスレッドを開始"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with self._lock:
+                        self._refresh()
+                        pending = self._log_entries
+                    if pending >= min_entries:
+                        self.compact()
+                except Exception:
+                    pass  # 次の周期で再試行する
+
+        with self._lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=run, name="post-log-compactor", daemon=True)
+                self._compactor.start()
+        return self
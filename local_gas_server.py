@@ -0,0 +1,271 @@
+"""GAS（Google Apps Script）の代わりに使うローカルHTTPサーバー（動作確認・負荷試験用）
+
+本番のGASと同じ取り決めで応答する:
+- GET                  : 全投稿のリスト
+- GET ?since=<cursor>  : cursor以降の投稿 {"posts": [...], "cursor": "..."}（--no-delta で無効）
+- GET ?limit=<N>&before=<id> : idがbefore未満の投稿を新しい順にN件 {"posts": [...], "next": ...}
+- GET ?action=clear    : 全投稿を削除
+- GET ?action=stats    : このサーバーの受信件数など（試験用）
+- GET ?action=partitions : 投稿のあるイベントID {"partitions": [...]}
+- GET ?action=version  : 追加・削除のたびに増えるデータバージョン {"version": n}
+- GET ?partition=<id>  : 上記のGET・clearをそのイベントの投稿だけに絞る
+                         （partitionの無い従来の投稿はどのイベントにも含める。post_store.pyの取り決めと同じ）
+- POST                 : 投稿を1件追加（post_idが同じ投稿は追加しない）。応答に投稿後のversionを含む
+- POST ?action=bulk    : {"posts": [...]} をまとめて追加し {"accepted": [post_id, ...]} を返す
+
+遅延・エラー率・応答サイズ・Google Sheetsの時刻形式を指定でき、
+secrets.tomlの gas_url を http://127.0.0.1:8765/exec に向ければアプリをそのまま試せる。
+
+実行方法: python local_gas_server.py [--port 8765] [--latency 0.3] [--error-rate 0.05]
+                                    [--time-format mixed] [--seed 1000] [--padding 200] [--partition 2025-08-16]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Google Sheetsから返ってくる時刻の形式
+TIME_FORMATS = {
+    'iso': lambda t: t.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),  # "2025-08-16T04:44:03.000Z"
+    'slash': lambda t: t.strftime('%Y/%m/%d %H:%M:%S'),  # "2025/08/16 13:44:03"
+    'us': lambda t: t.strftime('%m/%d/%Y %H:%M:%S'),  # "08/16/2025 13:44:03"
+}
+
+SAMPLE_TEXTS = [
+    '模擬授業が楽しかった！', '先輩が優しく案内してくれた', '食堂のご飯がおいしかった',
+    '説明が少し難しかった', 'キャンパスが広くて迷った', '入学したいと思いました',
+]
+
+
+class FakeGasBackend:
+    """投稿を保持するメモリ上のシート（スレッドセーフ）"""
+
+    def __init__(self, time_format='iso', padding=0, delta=True, default_partition=None):
+        self.time_format = time_format
+        # ダミー投稿に付けるイベントID。アプリと同じく既定は今日の日付
+        self.default_partition = default_partition or datetime.now().strftime('%Y-%m-%d')
+        self.padding = padding
+        self.delta = delta
+        self._rows = []  # (id, epoch, post)
+        self._post_ids = set()
+        self._next_id = 1
+        self._version = 0  # 追加・削除のたびに増やす
+        self._lock = threading.Lock()
+        self.counters = {'get': 0, 'version': 0, 'post': 0, 'bulk': 0, 'clear': 0, 'errors': 0}
+
+    def _format_time(self, row_id, epoch):
+        time_format = self.time_format
+        if time_format == 'mixed':
+            time_format = ('iso', 'slash', 'us')[row_id % 3]
+        return TIME_FORMATS[time_format](datetime.fromtimestamp(epoch).astimezone())
+
+    def _render(self, row_id, epoch, post):
+        post = dict(post, id=row_id, time=self._format_time(row_id, epoch))
+        if self.padding:
+            post['padding'] = 'x' * self.padding  # シートの余分な列の代わり
+        return post
+
+    def append(self, post):
+        """1件追加（同じpost_idは無視）し、post_idを返す"""
+        post = dict(post)
+        post_id = post.get('post_id')
+        try:
+            epoch = datetime.fromisoformat(str(post.get('time')).replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            epoch = time.time()
+        with self._lock:
+            if post_id and post_id in self._post_ids:
+                return post_id
+            if post_id:
+                self._post_ids.add(post_id)
+            self._rows.append((self._next_id, epoch, post))
+            self._next_id += 1
+            self._version += 1
+        return post_id
+
+    def seed(self, count):
+        """ダミー投稿をcount件追加"""
+        now = time.time()
+        for i in range(count):
+            score = random.randint(0, 100)
+            self.append({
+                'user': f'来場者{i + 1}',
+                'text': random.choice(SAMPLE_TEXTS),
+                'sentiment': score,
+                'emotion': '😊 満足' if score >= 60 else '😐 普通',
+                'reason': 'ダミー投稿',
+                'keywords': [],
+                'model_used': 'dummy',
+                'time': datetime.fromtimestamp(now - (count - i) * 3).isoformat(),
+                'color': '#28a745' if score >= 60 else '#6c757d',
+                'hash': f'seed-{i}',
+                'partition': self.default_partition
+            })
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """受信件数と現在の行数"""
+        with self._lock:
+            return dict(self.counters, rows=len(self._rows))
+
+    def clear(self, partition=None):
+        """全投稿（partitionを指定するとそのイベントの投稿とpartitionの無い従来の投稿）を削除"""
+        with self._lock:
+            kept = [row for row in self._rows if partition is not None and not self._in_partition(row, partition)]
+            self._rows = kept
+            self._version += 1
+            self._post_ids = {row[2]['post_id'] for row in kept if row[2].get('post_id')}
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def partitions(self):
+        """投稿のあるイベントID"""
+        with self._lock:
+            return sorted({row[2]['partition'] for row in self._rows if row[2].get('partition')})
+
+    @staticmethod
+    def _in_partition(row, partition):
+        # partitionの無い従来の投稿はどのイベントにも含める
+        return partition is None or row[2].get('partition') in (None, '', partition)
+
+    def _select(self, partition):
+        with self._lock:
+            return [row for row in self._rows if self._in_partition(row, partition)]
+
+    def page(self, limit, before=None, partition=None):
+        """idがbefore未満の投稿を新しい順にlimit件"""
+        rows = [row for row in self._select(partition) if before is None or row[0] < before]
+        selected = rows[::-1][:limit]
+        next_before = selected[-1][0] if len(rows) > limit else None
+        return {'posts': [self._render(*row) for row in selected], 'next': next_before}
+
+    def list_posts(self, since=None, partition=None):
+        """全件のリスト、またはsince以降の差分"""
+        with self._lock:
+            last_id = self._next_id - 1
+        rows = self._select(partition)
+        if since is None or not self.delta:
+            return [self._render(*row) for row in rows]
+        try:
+            since_id = int(since)
+            selected = [row for row in rows if row[0] >= since_id]
+        except ValueError:
+            since_epoch = datetime.fromisoformat(since.replace('Z', '+00:00')).timestamp()
+            selected = [row for row in rows if row[1] >= since_epoch]
+        return {'posts': [self._render(*row) for row in selected], 'cursor': last_id}
+
+
+def make_handler(backend, latency=0.0, error_rate=0.0):
+    """指定した遅延・エラー率で応答するリクエストハンドラ"""
+
+    class FakeGasHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _simulate(self):
+            """GASの処理時間と一時的なエラーを再現（エラーを返した場合はFalse）"""
+            if latency:
+                time.sleep(random.uniform(latency / 2, latency * 1.5))
+            if error_rate and random.random() < error_rate:
+                backend.count('errors')
+                self._send_json({'status': 'error', 'message': 'Service invoked too many times'}, status=503)
+                return False
+            return True
+
+        def do_GET(self):
+            params = parse_qs(urlparse(self.path).query)
+            action = params.get('action', [None])[0]
+            partition = params.get('partition', [None])[0]
+            if action == 'stats':
+                self._send_json(backend.stats())
+                return
+            if not self._simulate():
+                return
+            if action == 'clear':
+                backend.count('clear')
+                backend.clear(partition)
+                self._send_json({'status': 'success'})
+                return
+            if action == 'version':
+                backend.count('version')
+                self._send_json({'version': backend.version()})
+                return
+            if action == 'partitions':
+                self._send_json({'partitions': backend.partitions()})
+                return
+            backend.count('get')
+            if 'limit' in params:
+                before = params.get('before', [None])[0]
+                self._send_json(backend.page(int(params['limit'][0]), int(before) if before else None, partition))
+                return
+            self._send_json(backend.list_posts(params.get('since', [None])[0], partition))
+
+        def do_POST(self):
+            params = parse_qs(urlparse(self.path).query)
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send_json({'status': 'error', 'message': 'invalid json'}, status=400)
+                return
+            if not self._simulate():
+                return
+            if params.get('action', [None])[0] == 'bulk':
+                backend.count('bulk')
+                accepted = [backend.append(post) for post in data.get('posts', [])]
+                self._send_json({'accepted': [post_id for post_id in accepted if post_id], 'version': backend.version()})
+                return
+            backend.count('post')
+            backend.append(data)
+            self._send_json({'status': 'success', 'version': backend.version()})
+
+    return FakeGasHandler
+
+
+def start_server(backend, port=0, latency=0.0, error_rate=0.0):
+    """バックグラウンドでサーバーを起動し、(server, url) を返す（port=0で空いているポート）"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(backend, latency, error_rate))
+    threading.Thread(target=server.serve_forever, name="local-gas-server", daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/exec'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GASの代わりのローカルサーバー')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='平均応答時間（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='503を返す割合（0〜1）')
+    parser.add_argument('--time-format', choices=[*TIME_FORMATS, 'mixed'], default='iso', help='返す時刻の形式')
+    parser.add_argument('--seed', type=int, default=0, help='最初に入れておくダミー投稿の件数')
+    parser.add_argument('--padding', type=int, default=0, help='1投稿あたりに追加する余分なバイト数')
+    parser.add_argument('--partition', help='ダミー投稿のイベントID（既定は今日の日付）')
+    parser.add_argument('--no-delta', action='store_true', help='since指定を無視して常に全件を返す（旧GAS）')
+    args = parser.parse_args()
+
+    backend = FakeGasBackend(time_format=args.time_format, padding=args.padding, delta=not args.no_delta,
+                             default_partition=args.partition)
+    backend.seed(args.seed)
+    server, url = start_server(backend, args.port, args.latency, args.error_rate)
+    print(f"ローカルGASサーバーを起動しました: {url}")
+    print(f'secrets.toml に gas_url = "{url}" を設定してください（Ctrl+Cで終了）')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
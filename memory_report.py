@@ -0,0 +1,61 @@
+"""メモリ使用量の概算（管理用の表示向け）
+
+sys.getsizeofは入れ物自体の大きさしか返さないため、中身をたどって合計する。
+同じオブジェクトは1回だけ数える（共有されている投稿の辞書などを二重に数えない）。
+"""
+import sys
+
+import numpy as np
+
+
+def deep_sizeof(obj, seen=None):
+    """objから参照されているものを含めたおおよそのバイト数"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        # データを持つ配列はgetsizeofに含まれる。ビューは元の配列を数える
+        size = sys.getsizeof(obj)
+        if isinstance(obj.base, np.ndarray):
+            size += deep_sizeof(obj.base, seen)
+        if obj.dtype == object:
+            size += sum(deep_sizeof(item, seen) for item in obj.ravel())
+        return size
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deep_sizeof(vars(obj), seen)
+        size += sum(deep_sizeof(value, seen) for value in _slot_values(obj))
+    return size
+
+
+def _slot_values(obj):
+    """__slots__で持っている属性の値（親クラスの分も含む。未設定の属性は除く）"""
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name in ('__dict__', '__weakref__'):
+                continue
+            try:
+                yield getattr(obj, name)
+            except AttributeError:
+                pass
+
+
+def format_bytes(size):
+    """バイト数を読みやすい単位の文字列に"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
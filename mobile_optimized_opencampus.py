@@ -3,13 +3,27 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import html
 import json
-import requests
+from gas_client import GasClient
+from memory_report import deep_sizeof, format_bytes
 import time
 from google import genai
 from google.genai import types
 import traceback
 import os
+import random
+import re
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dedup_index import PostDedupIndex
+from near_duplicate import NearDuplicateIndex
+from outbox import SENT, PostOutbox
+from post_export import EXPORT_FORMATS, export_callable
+from post_store import PartitionedPostStore, PostFeed, PostSnapshot, post_key
+from post_table import PostTable
 
 # ページ設定
 st.set_page_config(page_title="感情分析SNS", page_icon="🎓", layout="wide")
@@ -136,6 +150,9 @@ if 'show_success' not in st.session_state:
     st.session_state.show_success = False
 if 'auto_update_enabled' not in st.session_state:
     st.session_state.auto_update_enabled = True
+if 'update_interval' not in st.session_state:
+    # 自動更新の間隔はセッションごとにずらす（全員が同時に再読み込みしないように）
+    st.session_state.update_interval = random.uniform(24, 36)
 if 'gemini_debug' not in st.session_state:
     st.session_state.gemini_debug = False
 if 'analysis_result' not in st.session_state:
@@ -146,6 +163,49 @@ if 'analysis_done' not in st.session_state:
 # デバッグモード切り替え（時刻問題調査のため強制有効化）
 DEBUG_MODE = True  # 強制的にTrueに設定  # 元に戻す
 
+# キーワード分析用の辞書（ローカル分析・フォールバック共通）
+POSITIVE_WORDS = [
+    '楽しい', '嬉しい', '最高', '良い', 'すごい', 'がんばる', '頑張る', 
+    '感動', '素晴らしい', 'ありがとう', '大好き', '幸せ', 'やったー',
+    '成功', '合格', '勝利', '達成', '完璧', '満足', 'ワクワク',
+    '興味深い', '面白い', '魅力的', '素敵', 'かっこいい', '美しい',
+    '充実', '発見', '学べる', '勉強になる', '将来', '夢', '希望',
+    '入学したい', '通いたい', '憧れ', '目標', 'やる気', 'モチベーション'
+]
+    
+NEGATIVE_WORDS = [
+    '悲しい', '辛い', '大変', '不安', '心配', '疲れた', 'つまらない', 
+    '嫌', '困った', 'ダメ', '失敗', '最悪', 'むかつく', 'イライラ',
+    '落ち込む', 'がっかり', '残念', '苦しい', '難しい', '分からない',
+    '迷う', '悩む', '微妙'
+]
+
+# 逆接表現（感情が混在している可能性がある）
+CONTRAST_WORDS = ['けど', 'けれど', 'でも', 'しかし', 'だが']
+
+# 分析カスケード設定（ローカル分析の信頼度が閾値以上ならGeminiを呼ばない）
+CASCADE_CONFIDENCE_THRESHOLD = float(st.secrets.get("cascade_confidence_threshold", 0.8))
+CASCADE_AUDIT_RATE = float(st.secrets.get("cascade_audit_rate", 0.1))  # 監査のためGeminiでも分析する割合
+CASCADE_AGREEMENT_MARGIN = int(st.secrets.get("cascade_agreement_margin", 15))  # 一致とみなすスコア差
+
+# 類似投稿の検出設定
+NEAR_DUPLICATE_WINDOW = int(st.secrets.get("near_duplicate_window", 2000))  # 索引に保持する直近の件数
+NEAR_DUPLICATE_REUSE_THRESHOLD = float(st.secrets.get("near_duplicate_reuse_threshold", 0.9))  # 分析結果を再利用する類似度
+NEAR_DUPLICATE_MAX_REPEATS = int(st.secrets.get("near_duplicate_max_repeats", 0))  # 同じ人の類似投稿の上限（0で無制限）
+NEAR_DUPLICATE_REPEAT_SECONDS = int(st.secrets.get("near_duplicate_repeat_seconds", 300))
+
+# GASとの同期間隔（秒）。この3倍以上同期できていなければ「○時点のデータ」と表示する
+POLL_INTERVAL = int(st.secrets.get("poll_interval", 10))
+
+# 感想一覧の1ページの件数（「もっと見る」で追加する件数）
+FEED_PAGE_SIZE = int(st.secrets.get("feed_page_size", 10))
+
+# イベントID（投稿・同期・集計はイベントごと）。未設定なら今日の日付
+DEFAULT_PARTITION = st.secrets.get("event_id") or datetime.now().strftime('%Y-%m-%d')
+if 'partition' not in st.session_state:
+    # ブースごとのQRコードなどで ?event=<id> を付けて開けるようにする
+    st.session_state.partition = st.query_params.get("event", DEFAULT_PARTITION)
+
 # Gemini API設定（新SDK対応）
 @st.cache_resource
 def setup_gemini():
@@ -194,12 +254,12 @@ def setup_gemini():
             st.code(traceback.format_exc())
         return None, error_msg, None
 
-def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite"):
-    """新SDK（google-genai）を使った高精度感情分析"""
+def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite", debug=DEBUG_MODE):
+    """新SDK（google-genai）を使った高精度感情分析（debug=Falseなら画面に何も表示しない）"""
     if not client:
-        if DEBUG_MODE:
+        if debug:
             st.warning("⚠️ Gemini client is None, using fallback analysis")
-        return simple_sentiment_analysis_fallback(text)
+        return simple_sentiment_analysis_fallback(text, debug)
     
     try:
         # システム指示（オープンキャンパス特化）
@@ -243,7 +303,7 @@ def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite")
 - 😢 不満: 0-24点
 """
         
-        if DEBUG_MODE:
+        if debug:
             st.info(f"🔍 Gemini APIにリクエスト送信中... (モデル: {model_name})")
         
         # 新SDKでAPIリクエスト
@@ -255,7 +315,7 @@ def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite")
             contents=prompt
         )
         
-        if DEBUG_MODE:
+        if debug:
             st.success("✅ Gemini APIから応答受信")
             with st.expander("📄 Gemini生レスポンス"):
                 st.code(response.text)
@@ -270,7 +330,7 @@ def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite")
             elif "```" in response_text:
                 response_text = response_text.split("```")[1].strip()
             
-            if DEBUG_MODE:
+            if debug:
                 st.info("🔧 JSON抽出結果:")
                 st.code(response_text)
             
@@ -286,43 +346,44 @@ def analyze_sentiment_with_llm(text, client, model_name="gemini-2.5-flash-lite")
                 'score': int(result.get('score', 50)),
                 'emotion': result.get('emotion', '😐 普通'),
                 'reason': result.get('reason', f'Gemini {model_name} による詳細分析'),
-                'keywords': result.get('keywords', [])
+                'keywords': result.get('keywords', []),
+                'tier': 'llm'
             }
             
-            if DEBUG_MODE:
+            if debug:
                 st.success("✅ JSON解析成功")
                 st.json(final_result)
             
             return final_result
             
         except (json.JSONDecodeError, ValueError, KeyError) as parse_error:
-            if DEBUG_MODE:
+            if debug:
                 st.warning(f"⚠️ JSON解析エラー: {parse_error}")
                 st.info("🔄 フォールバック解析を実行中...")
-            return parse_llm_response_fallback(response.text, text, model_name)
+            return parse_llm_response_fallback(response.text, text, model_name, debug)
             
     except Exception as e:
         error_msg = f"LLM analysis error: {str(e)}"
-        if DEBUG_MODE:
+        if debug:
             st.error(f"❌ Gemini API エラー: {error_msg}")
             st.code(traceback.format_exc())
         
         # レート制限エラーの場合は特別な処理
         if "429" in str(e) or "quota" in str(e).lower():
-            if DEBUG_MODE:
+            if debug:
                 st.error("🚨 レート制限に達しました。フォールバック分析を使用します。")
             # フォールバックモデルを試行
             if model_name == "gemini-2.5-flash-lite":
-                return analyze_sentiment_with_llm(text, client, "gemini-2.0-flash-lite")
+                return analyze_sentiment_with_llm(text, client, "gemini-2.0-flash-lite", debug)
         
-        return simple_sentiment_analysis_fallback(text)
+        return simple_sentiment_analysis_fallback(text, debug)
 
-def parse_llm_response_fallback(response_text, original_text, model_name):
+def parse_llm_response_fallback(response_text, original_text, model_name, debug=DEBUG_MODE):
     """LLM応答のパースに失敗した場合のフォールバック"""
     try:
         import re
         
-        if DEBUG_MODE:
+        if debug:
             st.info("🔧 テキスト解析フォールバック実行中...")
         
         # スコアを正規表現で抽出
@@ -371,43 +432,28 @@ def parse_llm_response_fallback(response_text, original_text, model_name):
             'score': max(0, min(100, score)),
             'emotion': emotion,
             'reason': f'Gemini {model_name} の部分解析',
-            'keywords': []
+            'keywords': [],
+            'tier': 'llm'
         }
         
-        if DEBUG_MODE:
+        if debug:
             st.success("✅ テキスト解析フォールバック成功")
             st.json(result)
         
         return result
         
     except Exception as e:
-        if DEBUG_MODE:
+        if debug:
             st.error(f"❌ テキスト解析フォールバックエラー: {e}")
-        return simple_sentiment_analysis_fallback(original_text)
+        return simple_sentiment_analysis_fallback(original_text, debug)
 
-def simple_sentiment_analysis_fallback(text):
+def simple_sentiment_analysis_fallback(text, debug=DEBUG_MODE):
     """フォールバック用のシンプル分析"""
-    if DEBUG_MODE:
+    if debug:
         st.warning("⚠️ キーワードベース分析にフォールバック")
     
-    positive_words = [
-        '楽しい', '嬉しい', '最高', '良い', 'すごい', 'がんばる', '頑張る', 
-        '感動', '素晴らしい', 'ありがとう', '大好き', '幸せ', 'やったー',
-        '成功', '合格', '勝利', '達成', '完璧', '満足', 'ワクワク',
-        '興味深い', '面白い', '魅力的', '素敵', 'かっこいい', '美しい',
-        '充実', '発見', '学べる', '勉強になる', '将来', '夢', '希望',
-        '入学したい', '通いたい', '憧れ', '目標', 'やる気', 'モチベーション'
-    ]
-    
-    negative_words = [
-        '悲しい', '辛い', '大変', '不安', '心配', '疲れた', 'つまらない', 
-        '嫌', '困った', 'ダメ', '失敗', '最悪', 'むかつく', 'イライラ',
-        '落ち込む', 'がっかり', '残念', '苦しい', '難しい', '分からない',
-        '迷う', '悩む', '微妙'
-    ]
-    
-    positive_count = sum(1 for word in positive_words if word in text)
-    negative_count = sum(1 for word in negative_words if word in text)
+    positive_count = sum(1 for word in POSITIVE_WORDS if word in text)
+    negative_count = sum(1 for word in NEGATIVE_WORDS if word in text)
     
     if positive_count > negative_count:
         score = 50 + (positive_count * 10)
@@ -433,122 +479,479 @@ def simple_sentiment_analysis_fallback(text):
         'score': score,
         'emotion': emotion,
         'reason': 'キーワードベース分析（フォールバック）',
-        'keywords': []
+        'keywords': [],
+        'tier': 'fallback'  # Geminiを使えなかった
     }
 
+def local_sentiment_analysis(text):
+    """キーワードによるローカル分析（信頼度付き）"""
+    positive_count = sum(1 for word in POSITIVE_WORDS if word in text)
+    negative_count = sum(1 for word in NEGATIVE_WORDS if word in text)
+    has_contrast = any(word in text for word in CONTRAST_WORDS)
+    
+    # ポジティブとネガティブが混在、または逆接表現がある場合は判定が難しい
+    mixed = (positive_count > 0 and negative_count > 0) or has_contrast
+    dominant_count = abs(positive_count - negative_count)
+    
+    if mixed or dominant_count == 0:
+        confidence = 0.0
+    else:
+        # 一致したキーワードが多いほど信頼度が高い（1語: 0.6、2語: 0.8、3語以上: 1.0）
+        confidence = min(1.0, 0.4 + dominant_count * 0.2)
+    
+    score = max(0, min(100, 50 + (positive_count - negative_count) * 15))
+    
+    if score >= 90:
+        emotion = "😍 大感動"
+    elif score >= 75:
+        emotion = "😊 とても満足"
+    elif score >= 60:
+        emotion = "🙂 満足"
+    elif score >= 45:
+        emotion = "😐 普通"
+    elif score >= 25:
+        emotion = "😞 やや不満"
+    else:
+        emotion = "😢 不満"
+    
+    keywords = [word for word in POSITIVE_WORDS + NEGATIVE_WORDS if word in text]
+    
+    return {
+        'score': score,
+        'emotion': emotion,
+        'reason': 'キーワード分析（明確な感想のためAI分析を省略）',
+        'keywords': keywords[:5],
+        'tier': 'local',
+        'confidence': confidence,
+        'mixed': mixed
+    }
+
+@st.cache_resource
+def get_cascade_stats():
+    """分析カスケードの統計（全セッション共有）"""
+    return {
+        'lock': threading.Lock(),
+        'total': 0,
+        'escalated': 0,
+        'audited': 0,
+        'agreed': 0,
+        'audit_log': deque(maxlen=50)
+    }
+
+@st.cache_resource
+def get_near_duplicate_index():
+    """類似投稿の索引（全セッション共有）"""
+    return NearDuplicateIndex(max_entries=NEAR_DUPLICATE_WINDOW)
+
+@st.cache_resource
+def get_audit_executor():
+    """監査用のGemini呼び出しをバックグラウンドで行うスレッド（全セッション共有）"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="cascade-audit")
+
+def audit_local_result(text, local_result, client, model_name, stats):
+    """ローカル分析の結果をGeminiの結果と比べてstatsに記録する（バックグラウンドで実行・画面には表示しない）
+
+    ワーカースレッドからはStreamlitのキャッシュ関数を呼ばないよう、statsは呼び出し側で取得して渡す。
+    """
+    llm_result = analyze_sentiment_with_llm(text, client, model_name, debug=False)
+    if llm_result.get('tier') != 'llm':
+        return  # Geminiで分析できなかった場合は一致率に含めない
+    agreed = abs(llm_result['score'] - local_result['score']) <= CASCADE_AGREEMENT_MARGIN
+    with stats['lock']:
+        stats['audited'] += 1
+        if agreed:
+            stats['agreed'] += 1
+        stats['audit_log'].append({
+            'text': text[:30],
+            'local': local_result['score'],
+            'llm': llm_result['score'],
+            'agreed': agreed
+        })
+
+def analyze_sentiment_cascade(text, client, model_name="gemini-2.5-flash-lite"):
+    """ローカル分析で明確な感想はそのまま確定し、判定が難しいものだけGeminiに送る"""
+    # ほぼ同じ感想が最近分析済みなら、その結果を再利用する
+    near_duplicate_index = get_near_duplicate_index()
+    match = near_duplicate_index.query(text, NEAR_DUPLICATE_REUSE_THRESHOLD, with_analysis=True)
+    if match:
+        similarity, cached_result, _ = match
+        if DEBUG_MODE:
+            st.info(f"♻️ 類似度 {similarity:.2f} の分析済み感想があるため結果を再利用します")
+        return dict(cached_result)
+    
+    return _analyze_sentiment_cascade(text, client, model_name)
+
+def _analyze_sentiment_cascade(text, client, model_name):
+    """カスケード分析の本体"""
+    stats = get_cascade_stats()
+    local_result = local_sentiment_analysis(text)
+    confident = local_result['confidence'] >= CASCADE_CONFIDENCE_THRESHOLD and not local_result['mixed']
+    
+    if not confident:
+        if DEBUG_MODE:
+            st.info(f"🔀 信頼度 {local_result['confidence']:.2f} のためGeminiで分析します")
+        result = analyze_sentiment_with_llm(text, client, model_name)
+        with stats['lock']:
+            stats['total'] += 1
+            # 実際にGeminiで分析できた分だけ数える（クライアントが無い・失敗した場合は数えない）
+            if result.get('tier') == 'llm':
+                stats['escalated'] += 1
+        return result
+    
+    with stats['lock']:
+        stats['total'] += 1
+    
+    # 一部の投稿はGeminiでも分析し、ローカル分析との一致率を監査する（投稿者は待たせない）
+    if client and random.random() < CASCADE_AUDIT_RATE:
+        get_audit_executor().submit(audit_local_result, text, local_result, client, model_name, stats)
+    
+    if DEBUG_MODE:
+        st.info(f"⚡ 信頼度 {local_result['confidence']:.2f} のためローカル分析で確定しました")
+    return local_result
+
 # Google Apps Script URL
 GAS_URL = st.secrets.get("gas_url", "")
 
-@st.cache_data(ttl=10, show_spinner=False)
-def load_posts():
-    """投稿を読み込み（キャッシュ付き）- 時刻保持修正版"""
+@st.cache_resource
+def get_gas_client():
+    """GAS通信用の共有クライアント（接続を使い回す）"""
+    return GasClient(
+        pool_size=int(st.secrets.get("gas_pool_size", 10)),
+        max_retries=int(st.secrets.get("gas_max_retries", 3)),
+        backoff_factor=float(st.secrets.get("gas_backoff_factor", 0.5))
+    )
+
+def fetch_posts_from_gas(partition, since=None, gas_client=None, limit=None):
+    """GASからイベントの投稿を取得（sinceを指定すると差分のみ、limitを指定すると新しい順の1ページ）"""
+    gas_client = gas_client or get_gas_client()
+    params = {'partition': partition}
+    if since is not None:
+        params['since'] = since
+    if limit is not None:
+        params['limit'] = limit
+    response = gas_client.get(GAS_URL, params=params, timeout=10)  # タイムアウトを延長
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_resource
+def get_post_store():
+    """GASと同期する共有ストア（イベントごとにポーリングスレッドは1つだけ）"""
+    # ポーリングスレッドからはStreamlitのキャッシュ関数を呼ばないよう、クライアントを渡しておく
+    gas_client = get_gas_client()
+    return PartitionedPostStore(
+        lambda partition, since: fetch_posts_from_gas(partition, since, gas_client),
+        # データバージョンが変わっていなければ投稿を取得しない（他のレプリカの書き込みも1回の問い合わせで分かる）
+        version_fetch=lambda partition: gas_client.data_version(GAS_URL, {'partition': partition}, timeout=5),
+        # 保存したスナップショットが無い初回は、全件の前に新しい順の1ページだけを先に読む（ポーリングスレッドで）
+        page_fetch=lambda partition, limit: fetch_posts_from_gas(partition, gas_client=gas_client, limit=limit),
+        first_page_size=FEED_PAGE_SIZE,
+        snapshot_path=st.secrets.get("snapshot_path", "post_snapshot.bin"),
+        idle_timeout=int(st.secrets.get("partition_idle_timeout", 300)),  # 見られていないイベントは同期を止める
+        interval=POLL_INTERVAL,
+        full_sync_interval=int(st.secrets.get("full_sync_interval", 30)),
+        pending_ttl=int(st.secrets.get("pending_ttl", 600))  # GASに現れない送信中の投稿を表示し続けない
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_partitions():
+    """GASに投稿のあるイベントIDの一覧（非対応のGASや通信エラーなら空）"""
+    try:
+        response = get_gas_client().get(GAS_URL, params={'action': 'partitions'}, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+    except Exception:
+        return []
+    return data.get('partitions', []) if isinstance(data, dict) else []
+
+def partition_options():
+    """イベント選択欄の選択肢（新しい順）"""
+    if GAS_URL:
+        known = fetch_partitions()
+    else:
+        known = [post.get('partition') for post in st.session_state.get('posts', [])]
+    options = {DEFAULT_PARTITION, st.session_state.partition}
+    options.update(partition for partition in known if partition)
+    return sorted(options, reverse=True)
+
+def bump_local_version():
+    """テストモードの投稿が変わったらデータバージョンを増やす（件数と違い、クリア後に同じ値に戻らない）"""
+    st.session_state.local_version = st.session_state.get('local_version', 0) + 1
+
+def load_snapshot():
+    """投稿と集計用テーブルを読み込み（共有ストアの最新スナップショットを参照するだけで通信しない）"""
+    partition = st.session_state.partition
     if not GAS_URL:
-        return st.session_state.get('posts', [])
+        # テストモード: この端末の投稿からその場で作成
+        local_posts = tuple(
+            post for post in st.session_state.get('posts', []) if post.get('partition') in (None, partition)
+        )
+        return PostSnapshot(
+            version=st.session_state.get('local_version', 0), posts=local_posts, table=PostTable.from_posts(local_posts).view(),
+            feed=PostFeed(local_posts), synced_at=time.time(), error=None
+        )
     
-    try:
-        response = requests.get(GAS_URL, timeout=10)  # タイムアウトを延長
-        if response.status_code == 200:
-            posts = response.json()
-            for post in posts:
-                # 時刻データの処理（変数定義の修正）
-                time_value = post.get('time')  # 変数定義をここに移動
-                
-                if time_value:
-                    try:
-                        if isinstance(time_value, str):
-                            # デバッグ: 元の時刻文字列を記録
-                            if DEBUG_MODE:
-                                st.write(f"🔍 元の時刻文字列: '{time_value}'")
-                            
-                            # Google Sheetsの複数の時刻フォーマットに対応
-                            time_str = time_value.replace('Z', '')
-                            
-                            # パターン1: "2025-08-16T13:44:03" 形式
-                            if 'T' in time_str:
-                                if '.' in time_str:
-                                    post['time'] = datetime.fromisoformat(time_str.split('.')[0])
-                                else:
-                                    post['time'] = datetime.fromisoformat(time_str)
-                            # パターン2: "2025/08/16 13:44:03" 形式
-                            elif '/' in time_str and ' ' in time_str:
-                                # Google Sheetsの日付形式を変換
-                                try:
-                                    post['time'] = datetime.strptime(time_str, '%Y/%m/%d %H:%M:%S')
-                                except ValueError:
-                                    # 別の形式を試行
-                                    try:
-                                        post['time'] = datetime.strptime(time_str, '%m/%d/%Y %H:%M:%S')
-                                    except ValueError:
-                                        # 最終フォールバック
-                                        post['time'] = datetime.now()
-                            else:
-                                # その他の形式
-                                post['time'] = datetime.fromisoformat(time_str)
-                            
-                            # デバッグ: 変換後の時刻を記録
-                            if DEBUG_MODE:
-                                st.write(f"🔍 変換後の時刻: {post['time']}")
-                                
-                        elif isinstance(time_value, datetime):
-                            # 既にdatetimeオブジェクトの場合はそのまま保持
-                            if DEBUG_MODE:
-                                st.write(f"🔍 datetime保持: {time_value}")
-                            # passではなく明示的に代入
-                            post['time'] = time_value
-                        else:
-                            # その他の型の場合は現在時刻（新規投稿として扱う）
-                            if DEBUG_MODE:
-                                st.write(f"🔍 型不明で現在時刻設定: {type(time_value)}")
-                            post['time'] = datetime.now()
-                    except Exception as time_error:
-                        # 変換エラー時のデバッグ情報
-                        if DEBUG_MODE:
-                            st.error(f"🔍 時刻変換エラー: {time_error} - 元データ: '{time_value}' (型: {type(time_value)})")
-                        # エラー時は現在時刻
-                        post['time'] = datetime.now()
-                else:
-                    # timeフィールドが存在しない場合のみ現在時刻
-                    if DEBUG_MODE:
-                        st.write("🔍 timeフィールドなし - 現在時刻設定")
-                    post['time'] = datetime.now()
-            
-            # デバッグ: 読み込み後の時刻確認
-            if DEBUG_MODE and posts:
-                st.info("🔍 読み込み後の時刻データ:")
-                for i, p in enumerate(posts[:3]):
-                    st.write(f"{i+1}. {p.get('user', 'unknown')} - {p.get('time', 'no time')}")
-            
-            # セッション状態にもバックアップ保存
-            st.session_state.posts_backup = posts
-            return posts
+    # スナップショットはイベントごとに全セッションで共有する（セッションにはバージョン番号だけを持たせ、コピーしない）
+    snapshot = get_post_store().snapshot(partition)
+    st.session_state.snapshot_version = snapshot.version
+    if DEBUG_MODE and snapshot.error:
+        st.warning(f"データ同期エラー: {snapshot.error}")
+    return snapshot
+
+def data_key(snapshot):
+    """スナップショットから作るもの（グラフなど）のキャッシュキー（イベントとデータのバージョン）"""
+    if not GAS_URL:
+        # テストモードの投稿はセッションごとに違うため、セッション間で共有しない
+        local_session_id = st.session_state.setdefault('local_session_id', random.getrandbits(64))
+        return (local_session_id, st.session_state.partition, snapshot.version)
+    return (st.session_state.partition, snapshot.version)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def measure_snapshot_bytes(key, _snapshot):
+    """共有スナップショットのメモリ量（データのバージョンごとに1回だけ計測）"""
+    return deep_sizeof(_snapshot)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_chart_data(key, _post_table):
+    """グラフ用のデータフレームと感情ごとの件数（返り値は共有されるため変更しないこと）"""
+    df = _post_table.to_frame()
+    # 通常は同期順＝時刻順なので並べ替えは不要
+    if not df['epoch'].is_monotonic_increasing:
+        df = df.sort_values('epoch', ignore_index=True)
+    df['感想順'] = range(1, len(df) + 1)
+    return df, _post_table.category_counts('emotion')
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_score_figure(key, _df):
+    """満足度スコア推移のグラフ（スマホ対応）"""
+    fig = go.Figure()
+    
+    # 満足度ラインの追加
+    fig.add_hline(y=50, line_dash="dash", line_color="gray", 
+                 annotation_text="普通(50点)", annotation_position="bottom right")
+    fig.add_hline(y=60, line_dash="dot", line_color="green", 
+                 annotation_text="満足ライン(60点)", annotation_position="top right")
+    
+    # メインデータの追加
+    fig.add_trace(go.Scatter(
+        x=_df['感想順'],
+        y=_df['sentiment'],
+        mode='lines+markers',
+        name='満足度スコア',
+        line=dict(color='#1f77b4', width=3),
+        marker=dict(size=8, color='#1f77b4'),
+        hovertemplate='<b>%{customdata[0]}</b><br>' +
+                     '満足度: %{y}点<br>' +
+                     '感想: %{customdata[1]}<extra></extra>',
+        customdata=_df[['user', 'text']].values
+    ))
+    
+    # スマホ対応レイアウト（エラー対策）
+    fig.update_layout(
+        title='参加者の満足度スコア推移（AI分析）',
+        height=400,
+        yaxis_title="満足度スコア",
+        xaxis_title="投稿順",
+        showlegend=False,
+        dragmode='pan',
+        margin=dict(l=50, r=20, t=50, b=50)
+    )
+    
+    # Y軸の範囲を固定（0-100）
+    fig.update_yaxes(range=[0, 100])
+    return fig
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_emotion_figure(key, _emotion_counts):
+    """満足度分布の円グラフ"""
+    fig = go.Figure(data=[go.Pie(
+        labels=_emotion_counts.index,
+        values=_emotion_counts.values,
+        hole=0.3,
+        textinfo='label+percent',
+        textposition='outside'
+    )])
+    
+    fig.update_layout(
+        title="参加者の満足度分布（AI分析）",
+        height=400,
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2),
+        margin=dict(l=20, r=20, t=50, b=50)
+    )
+    return fig
+
+# カードの色として受け付ける形式（#rgb〜#rrggbbaa）。それ以外は既定の色にする
+CARD_COLOR_PATTERN = re.compile(r'#[0-9a-fA-F]{3,8}')
+DEFAULT_CARD_COLOR = "#6c757d"
+
+@st.cache_resource(max_entries=2000, show_spinner=False)
+def build_post_card(card_key, _post):
+    """投稿カードのHTML（経過時間の前後で分けた2つの文字列）
+
+    card_keyは (イベント, 投稿のキー, 送信中かどうか)。同じ投稿のカードは全セッション・全バージョンで使い回す。
+    """
+    post = _post
+    # 分析理由やキーワード、使用モデルの表示（改善版）
+    analysis_info = ""
+    if post.get('reason'):
+        analysis_info += f"<div class='post-analysis'>💭 {html.escape(str(post['reason']))}</div>"
+    if post.get('keywords') and len(post['keywords']) > 0:
+        keywords_str = html.escape(', '.join(str(keyword) for keyword in post['keywords'][:3]))
+        analysis_info += f"<div class='post-analysis'>🔍 {keywords_str}</div>"
+
+    # 使用AIモデルの表示（model_usedフィールドを優先使用）
+    if post.get('model_used'):
+        # 新しいmodel_usedフィールドがある場合
+        model_used = post['model_used']
+        if model_used == "Gemini 2.5":
+            analysis_info += f"<div class='post-analysis'>🤖 Gemini 2.5で分析</div>"
+        elif model_used == "Gemini 2.0":
+            analysis_info += f"<div class='post-analysis'>🤖 Gemini 2.0で分析</div>"
+        elif model_used == "Gemini AI":
+            analysis_info += f"<div class='post-analysis'>🤖 Gemini AIで分析</div>"
+        elif model_used == "基本分析":
+            analysis_info += f"<div class='post-analysis'>⚙️ 基本分析で処理</div>"
         else:
-            if DEBUG_MODE:
-                st.warning(f"HTTP エラー: {response.status_code}")
-            return st.session_state.get('posts_backup', [])
-    except requests.exceptions.Timeout:
-        if DEBUG_MODE:
-            st.warning("⏰ タイムアウト: サーバーの応答が遅いです")
-        return st.session_state.get('posts_backup', [])
-    except Exception as load_error:
-        if DEBUG_MODE:
-            st.error(f"データ読み込みエラー: {load_error}")
-        return st.session_state.get('posts_backup', [])
+            analysis_info += f"<div class='post-analysis'>🤖 {html.escape(str(model_used))}で分析</div>"
+    elif post.get('reason'):
+        # 古い投稿でmodel_usedがない場合、reasonから推測
+        reason_text = str(post['reason'])
+
+        # reasonからの推測（フォールバック）
+        if "gemini" in reason_text.lower() and "フォールバック" not in reason_text:
+            analysis_info += f"<div class='post-analysis'>🤖 Gemini AIで分析</div>"
+        elif "フォールバック" in reason_text or "キーワードベース" in reason_text:
+            analysis_info += f"<div class='post-analysis'>⚙️ 基本分析で処理</div>"
+        else:
+            analysis_info += f"<div class='post-analysis'>🤖 AI分析</div>"
+    else:
+        # reasonもない古い投稿
+        analysis_info += f"<div class='post-analysis'>🤖 AI分析（詳細不明）</div>"
+
+    if post.get('pending'):
+        analysis_info += "<div class='post-analysis'>📤 送信中（まもなく全員に共有されます）</div>"
+    
+    # スマホ対応投稿表示（1枚ずつ送らず、まとめて1回のst.markdownで表示する。空行を含めないこと）
+    # GASの行は誰でも書き換えられるため、HTMLに埋め込む値はすべてエスケープする（色は形式を確認する）
+    user = html.escape(str(post['user']))
+    text = html.escape(str(post['text'])).replace('\n', '<br>')
+    emotion = html.escape(str(post['emotion']))
+    sentiment = html.escape(str(post['sentiment']))
+    color = post.get('color')
+    if not isinstance(color, str) or not CARD_COLOR_PATTERN.fullmatch(color):
+        color = DEFAULT_CARD_COLOR
+    head = (
+        f"<div class='post-card' style='--border-color: {color};'>"
+        f"<div class='post-header'><span class='post-user'>👤 {user}</span><span class='post-time'>⏰ "
+    )
+    tail = (
+        "</span></div>"
+        f"<div class='post-emotion' style='color: {color};'>{emotion} ({sentiment}点)</div>"
+        f"<div class='post-text'>💬 {text}</div>"
+        f"{analysis_info}</div>"
+    )
+    return head, tail
+
+def refresh_posts():
+    """共有ストアにすぐ同期するよう依頼（結果は次の画面更新で反映）"""
+    if GAS_URL:
+        get_post_store().request_refresh(st.session_state.partition)
+
+def send_posts_to_gas(posts, gas_client, bulk=False):
+    """アウトボックスの投稿をGASに送信し、送信できたpost_idを返す"""
+    if bulk:
+        # 一括送信に対応したGAS: 同じpost_idの行は追加しない
+        response = gas_client.post(GAS_URL + "?action=bulk", json={'posts': posts}, timeout=20)
+        response.raise_for_status()
+        return response.json().get('accepted', [])
+    
+    delivered = []
+    for post in posts:
+        response = gas_client.post(GAS_URL, json=post, timeout=10)
+        if response.status_code != 200:
+            break
+        delivered.append(post['post_id'])
+    return delivered
+
+@st.cache_resource
+def get_outbox():
+    """投稿の送信待ちキュー（全セッション共有・送信スレッドは1つだけ）"""
+    # 送信スレッドからはStreamlitのキャッシュ関数を呼ばないよう、必要なものを渡しておく
+    gas_client = get_gas_client()
+    post_store = get_post_store()
+    bulk = bool(st.secrets.get("gas_bulk_endpoint", False))
+    outbox = PostOutbox(
+        st.secrets.get("outbox_path", "post_outbox.sqlite3"),
+        lambda posts: send_posts_to_gas(posts, gas_client, bulk),
+        batch_size=int(st.secrets.get("outbox_batch_size", 20)),
+        sent_retention=int(st.secrets.get("outbox_sent_retention", 24 * 3600)),
+        on_delivered=lambda post_ids: post_store.request_refresh()
+    )
+    # 再起動前に受け付けた未送信の投稿を、送信中としてそれぞれのイベントのスナップショットに戻す
+    for post in outbox.pending_posts():
+        post_store.store(post.get('partition') or DEFAULT_PARTITION).add_pending(post)
+    return outbox.start()
+
+@st.cache_resource
+def get_dedup_index():
+    """投稿の重複チェック用インデックス（全セッション共有・GASの投稿と同期）"""
+    dedup_index = PostDedupIndex(
+        st.secrets.get("dedup_index_path", "post_dedup.bin"),
+        capacity=int(st.secrets.get("dedup_capacity", 100000)),
+        error_rate=float(st.secrets.get("dedup_error_rate", 0.001)),
+        recent_size=int(st.secrets.get("dedup_recent_size", 5000))
+    )
+    # 起動時: 今日のイベントの投稿と未送信の投稿から再構築し、以降は同期のたびに追加する
+    post_store = get_post_store()
+    dedup_index.add_many(post.get('hash') for post in post_store.snapshot(DEFAULT_PARTITION).posts)
+    dedup_index.add_many(post.get('hash') for post in get_outbox().pending_posts())
+    post_store.subscribe(lambda posts: dedup_index.add_many(post.get('hash') for post in posts))
+    return dedup_index
+
+def rebuild_dedup_index():
+    """全件クリア後に、残っている投稿（他のイベント・未送信）だけで重複チェックを作り直す"""
+    post_store = get_post_store()
+    post_hashes = [
+        post.get('hash')
+        for partition in post_store.active_partitions()
+        for post in post_store.snapshot(partition).posts
+    ]
+    post_hashes += [post.get('hash') for post in get_outbox().pending_posts()]
+    get_dedup_index().rebuild(post_hashes)
+
+def remember_near_duplicate(near_duplicate_index, text, nickname):
+    """受け付けた投稿を類似索引に1回だけ追加（分析結果はGeminiで分析できた場合だけ再利用用に持たせる）"""
+    analysis = st.session_state.get('analysis_result')
+    if not analysis or analysis.get('tier') != 'llm':
+        analysis = None
+    near_duplicate_index.add(text, analysis=dict(analysis) if analysis else None, user=nickname)
 
 def save_post(nickname, text, score, emotion, reason, keywords, color):
     """投稿を保存（重複防止・エラーハンドリング強化・モデル情報追加）"""
     # 重複チェック用のハッシュ生成
     import hashlib
-    post_hash = hashlib.md5(f"{nickname}{text}{score}".encode()).hexdigest()
+    # イベントごとに別の投稿として扱う（別のイベントでは同じ感想も投稿できる）
+    post_hash = hashlib.md5(f"{st.session_state.partition}{nickname}{text}{score}".encode()).hexdigest()
     
     # セッション状態に投稿履歴を保存
     if 'post_hashes' not in st.session_state:
         st.session_state.post_hashes = set()
     
-    # 重複チェック
+    # 重複チェック（この端末で投稿済みのもの）
     if post_hash in st.session_state.post_hashes:
         st.warning("⚠️ 同じ内容の投稿が既に存在します")
         return False
     
+    # 同じ人による似た内容の連投を制限
+    near_duplicate_index = get_near_duplicate_index()
+    if NEAR_DUPLICATE_MAX_REPEATS > 0:
+        repeats = near_duplicate_index.count_similar_by_user(
+            nickname, text, within_seconds=NEAR_DUPLICATE_REPEAT_SECONDS
+        )
+        if repeats >= NEAR_DUPLICATE_MAX_REPEATS:
+            st.warning("⚠️ 似た内容の投稿が続いています。少し時間をおいてから投稿してください")
+            return False
+    
     # モデル情報を取得
     model_info = st.session_state.get('temp_model_info', 'AI分析')
     
@@ -562,60 +965,69 @@ def save_post(nickname, text, score, emotion, reason, keywords, color):
         'model_used': model_info,  # モデル情報を明示的に保存
         'time': datetime.now().isoformat(),
         'color': color,
-        'hash': post_hash
+        'hash': post_hash,
+        'partition': st.session_state.partition  # 選択中のイベント
     }
     
     if GAS_URL:
-        # リトライ機能付きで投稿
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(GAS_URL, json=post_data, timeout=10)
-                if response.status_code == 200:
-                    # 成功時にハッシュを記録
-                    st.session_state.post_hashes.add(post_hash)
-                    load_posts.clear()
-                    return True
-                elif attempt < max_retries - 1:
-                    st.warning(f"⏳ 投稿試行中... ({attempt + 1}/{max_retries})")
-                    time.sleep(1)  # 1秒待機してリトライ
-                
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    st.warning(f"⏳ 接続中... ({attempt + 1}/{max_retries})")
-                    time.sleep(1)
-                else:
-                    st.error(f"❌ ネットワークエラー: {e}")
+        # 全セッション・他のレプリカの投稿も含めた重複チェック（通信なし）
+        dedup_index = get_dedup_index()
+        if dedup_index.contains(post_hash):
+            st.warning("⚠️ 同じ内容の投稿が既に存在します")
+            return False
         
-        return False
+        # ローカルのアウトボックスに保存した時点で受付完了（GASへの送信はバックグラウンド）
+        try:
+            post_id = get_outbox().submit(post_data)
+        except sqlite3.Error as e:
+            st.error(f"❌ 投稿の保存に失敗しました: {e}")
+            return False
+        # 保存できた投稿だけを登録する（失敗した投稿はそのまま再投稿できる）
+        dedup_index.add(post_hash)
+        st.session_state.post_hashes.add(post_hash)
+        st.session_state.setdefault('my_posts', []).append({'post_id': post_id, 'text': text})
+        # GASへの送信を待たずに共有スナップショットへ「送信中」として追加（全件の取り直しはしない）
+        get_post_store().store(post_data['partition']).add_pending(dict(post_data, post_id=post_id))
+        remember_near_duplicate(near_duplicate_index, text, nickname)
+        return True
     else:
         # ローカル保存
         if 'posts' not in st.session_state:
             st.session_state.posts = []
         post_data['time'] = datetime.now()
+        post_data['epoch'] = post_data['time'].timestamp()
         st.session_state.posts.append(post_data)
+        bump_local_version()
         st.session_state.post_hashes.add(post_hash)
+        remember_near_duplicate(near_duplicate_index, text, nickname)
         return True
 
 def clear_all_posts():
-    """すべての投稿をクリア"""
+    """選択中のイベントの投稿をすべてクリア（partition非対応の古いGASでは全件が消える）"""
+    partition = st.session_state.partition
     if GAS_URL:
         try:
             clear_url = GAS_URL + "?action=clear"
-            response = requests.get(clear_url, timeout=10)
+            response = get_gas_client().get(clear_url, params={'partition': partition}, timeout=10)
             
             if response.status_code == 200:
                 if 'posts' in st.session_state:
                     del st.session_state['posts']
                 if 'confirm_clear' in st.session_state:
                     del st.session_state['confirm_clear']
-                load_posts.clear()
+                get_post_store().store(partition).reset()
+                rebuild_dedup_index()
+                st.session_state.post_hashes = set()
                 return True
             return False
         except:
             return False
     else:
-        st.session_state.posts = []
+        st.session_state.posts = [
+            post for post in st.session_state.get('posts', []) if post.get('partition') not in (None, partition)
+        ]
+        bump_local_version()
+        st.session_state.post_hashes = set()
         if 'confirm_clear' in st.session_state:
             del st.session_state['confirm_clear']
         return True
@@ -627,25 +1039,35 @@ st.markdown("**今日のオープンキャンパスはいかがでしたか？AI
 # Gemini設定とデバッグ情報
 client, setup_status, current_model = setup_gemini()
 
+if GAS_URL:
+    # 再起動前の未送信の投稿の送信を再開する（最初の実行でだけアウトボックスが作られる）
+    get_outbox()
+
 # 接続状況とリアルタイム更新状態
 col_status1, col_status2 = st.columns(2)
 with col_status1:
     if GAS_URL:
         st.success("🌐 全参加者で共有中")
+        synced_at = get_post_store().snapshot(st.session_state.partition).synced_at
+        if synced_at is None:
+            st.info("⏳ みんなの感想を読み込み中です...")
+        elif time.time() - synced_at > POLL_INTERVAL * 3:
+            # 起動直後（前回保存したデータを表示中）やGASに接続できない間
+            st.caption(f"🕒 {datetime.fromtimestamp(synced_at).strftime('%m/%d %H:%M')} 時点のデータを表示しています（最新データを取得中）")
     else:
         st.warning("💻 この端末のみ（テストモード）")
 
 with col_status2:
     # スマホ向け手動更新ボタン（メイン画面に配置）
     if st.button("🔄 最新の感想を更新", help="最新の感想を今すぐ確認", key="main_refresh"):
-        load_posts.clear()
+        refresh_posts()
         st.session_state.last_update = datetime.now()
         # rerunを削除してメッセージのみ表示
         st.success("✅ 更新しました！")
 
 # 成功メッセージの表示（投稿後）
 if st.session_state.show_success:
-    st.success("✅ 感想を投稿しました！他の参加者にも共有されています 🎉")
+    st.success("✅ 感想を受け付けました！まもなく他の参加者にも共有されます 🎉")
     st.balloons()
     st.session_state.show_success = False
 
@@ -657,6 +1079,12 @@ with st.sidebar:
     else:
         st.markdown("**基本分析モード**")
     
+    # イベント（日付・ブース）の切り替え（投稿・一覧・集計はイベントごと）
+    st.selectbox(
+        "📅 イベント", partition_options(), key="partition",
+        on_change=lambda: st.session_state.pop('feed_limit', None)
+    )
+    
     # 自動更新制御
     st.markdown("## 🔄 更新設定")
     auto_update = st.toggle("自動更新を有効にする", value=st.session_state.auto_update_enabled)
@@ -669,22 +1097,94 @@ with st.sidebar:
     
     # 手動更新ボタン
     if st.button("🔄 今すぐ更新", use_container_width=True):
-        load_posts.clear()
+        refresh_posts()
         st.session_state.last_update = datetime.now()
         st.rerun()
     
     st.markdown("## 📊 現在の状況")
-    posts = load_posts()
-    total_posts = len(posts)
-    st.metric("参加者の感想", f"{total_posts}件")
     
-    if posts:
-        avg_score = sum(p['sentiment'] for p in posts) / total_posts
-        st.metric("平均満足度", f"{avg_score:.1f}点")
+    # 自動更新では一覧と同じ間隔でこの集計も再実行する（上の切り替えを反映するため、ここで定義する）
+    @st.fragment(run_every=st.session_state.update_interval if st.session_state.auto_update_enabled else None)
+    def show_status():
+        """サイドバーの現在の状況"""
+        snapshot = load_snapshot()
+        post_table = snapshot.table  # 集計は列指向テーブルで行う
+        total_posts = len(snapshot.posts)
+        if GAS_URL and snapshot.synced_at is None and total_posts:
+            st.metric("参加者の感想", "読み込み中…")  # 初回の全件取得の前は最新の1ページだけ
+            return
+        st.metric("参加者の感想", f"{total_posts}件")
+        
+        if total_posts:
+            avg_score = post_table.mean_score()
+            st.metric("平均満足度", f"{avg_score:.1f}点")
+            
+            positive_count = post_table.count_score_at_least(60)
+            st.metric("満足した人", f"{positive_count}人")
+    
+    show_status()
+    snapshot = load_snapshot()
+    posts = snapshot.posts
+    
+    # 分析カスケードの状況（Gemini呼び出し削減の効果確認用）
+    with st.expander("🔀 分析カスケード"):
+        cascade_stats = get_cascade_stats()
+        with cascade_stats['lock']:
+            cascade_total = cascade_stats['total']
+            cascade_escalated = cascade_stats['escalated']
+            cascade_audited = cascade_stats['audited']
+            cascade_agreed = cascade_stats['agreed']
+            audit_log = list(cascade_stats['audit_log'])
         
-        positive_count = len([p for p in posts if p['sentiment'] >= 60])
-        st.metric("満足した人", f"{positive_count}人")
+        st.caption(f"信頼度閾値: {CASCADE_CONFIDENCE_THRESHOLD} / 監査率: {CASCADE_AUDIT_RATE:.0%}")
+        if cascade_total:
+            st.metric("Gemini送信率", f"{cascade_escalated / cascade_total:.0%}", f"{cascade_escalated}/{cascade_total}件", delta_color="off")
+        else:
+            st.metric("Gemini送信率", "-")
+        if cascade_audited:
+            st.metric("Geminiとの一致率", f"{cascade_agreed / cascade_audited:.0%}", f"監査{cascade_audited}件", delta_color="off")
+        else:
+            st.metric("Geminiとの一致率", "-")
+        if audit_log:
+            st.dataframe(pd.DataFrame(audit_log[-10:]), use_container_width=True, hide_index=True)
     
+    # GAS通信の接続再利用状況
+    if GAS_URL:
+        with st.expander("🌐 通信状況"):
+            gas_metrics = get_gas_client().metrics()
+            st.metric("接続の再利用率", f"{gas_metrics['reuse_rate']:.0%}")
+            st.caption(f"リクエスト {gas_metrics['requests']}件 / 新規接続 {gas_metrics['connections']}件")
+            dedup_stats = get_dedup_index().stats()
+            st.caption(
+                f"重複チェック: {dedup_stats['total']}件登録（直近{dedup_stats['recent']}件は完全一致） / "
+                f"推定誤判定率 {dedup_stats['false_positive_rate']:.4%}"
+            )
+        
+        # 共有スナップショットと1セッションあたりのメモリ量
+        with st.expander("🧠 メモリ使用量"):
+            snapshot_bytes = measure_snapshot_bytes(data_key(snapshot), snapshot)
+            session_bytes = deep_sizeof(dict(st.session_state))
+            st.metric("共有スナップショット", format_bytes(snapshot_bytes), f"v{snapshot.version}（全セッションで1つ）", delta_color="off")
+            st.caption(f"同期中のイベント: {', '.join(get_post_store().active_partitions())}")
+            st.metric(
+                "1セッションあたり", format_bytes(session_bytes),
+                f"共有しない場合 {format_bytes(session_bytes + snapshot_bytes)}", delta_color="off"
+            )
+
+    # データエクスポート（ボタンが押されたときにだけファイルを作成）
+    if posts:
+        export_format = st.selectbox(
+            "ファイル形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+        )
+        _, export_mime, export_extension = EXPORT_FORMATS[export_format]
+        st.download_button(
+            "📄 感想データをダウンロード",
+            data=export_callable(posts, export_format),
+            file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}{export_extension}",
+            mime=export_mime,
+            use_container_width=True
+        )
+
     st.markdown("---")
     st.markdown("## 💡 投稿のヒント")
     st.markdown("""
@@ -759,6 +1259,7 @@ with left_col:
         if st.button("🔄 再分析", help="もう一度AI分析を実行", disabled=not reanalyze_enabled):
             # 既存の分析結果をクリアして再分析（rerunを削除）
             with st.spinner("🤖 再分析中..."):
+                # 再分析はカスケードや類似投稿の再利用を通さず、必ずGeminiに送る
                 analysis_result = analyze_sentiment_with_llm(message, client, current_model)
                 st.session_state.analysis_result = analysis_result
                 st.session_state.analysis_done = True
@@ -776,7 +1277,7 @@ with left_col:
         progress_bar.progress(30)
         
         # 分析実行
-        analysis_result = analyze_sentiment_with_llm(message, client, current_model)
+        analysis_result = analyze_sentiment_cascade(message, client, current_model)
         progress_bar.progress(80)
         
         # セッション状態に保存
@@ -798,6 +1299,8 @@ with left_col:
         emotion = analysis_result['emotion']
         reason = analysis_result.get('reason', '')
         keywords = analysis_result.get('keywords', [])
+        # Geminiで分析したかどうか（カスケードでローカル確定した場合は基本分析扱い）
+        used_llm = analysis_result.get('tier') == 'llm'
         
         # 色の決定
         if score >= 75:
@@ -819,7 +1322,7 @@ with left_col:
             st.metric("満足度スコア", f"{score}点", emotion)
         with col_model:
             # 使用モデルを表示（高校生にも分かりやすく・詳細表示）
-            if client and "フォールバック" not in reason:
+            if used_llm:
                 if current_model == "gemini-2.5-flash-lite":
                     st.success("🤖 Gemini 2.5")
                 elif current_model == "gemini-2.0-flash-lite":
@@ -833,6 +1336,8 @@ with left_col:
             # フォールバック使用時は警告色で表示
             if "フォールバック" in reason:
                 st.warning(f"💭 分析理由: {reason}")
+            elif analysis_result.get('tier') == 'local':
+                st.success(f"💭 分析理由: {reason}")
             else:
                 st.info(f"💭 分析理由: {reason}")
         
@@ -841,7 +1346,7 @@ with left_col:
         
         # AIモデル情報の保存（reasonとは別フィールド）
         ai_model_info = ""
-        if client and "フォールバック" not in reason:
+        if used_llm:
             if current_model == "gemini-2.5-flash-lite":
                 ai_model_info = "🤖 Gemini 2.5で分析"
                 # 投稿データにモデル情報を追加
@@ -881,20 +1386,15 @@ with left_col:
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                status_text.text("🔗 サーバーに接続中...")
-                progress_bar.progress(25)
-                time.sleep(0.5)
-                
-                status_text.text("📤 データを送信中...")
+                status_text.text("📥 投稿を受付中...")
                 progress_bar.progress(50)
                 
                 success = save_post(nickname, message, score, emotion, reason, keywords, color)
                 progress_bar.progress(75)
                 
                 if success:
-                    status_text.text("✅ 投稿完了！")
+                    status_text.text("✅ 受付完了！")
                     progress_bar.progress(100)
-                    time.sleep(1)
                     
                     # 投稿成功後、フォームをクリア
                     st.session_state.analysis_result = None
@@ -931,6 +1431,22 @@ with left_col:
                     st.error("❌ 投稿に失敗しました。ネットワーク接続を確認して、もう一度お試しください。")
                     st.session_state.is_posting = False
     
+    # 自分の投稿の送信状況（アウトボックスからGASへの送信）
+    if GAS_URL and st.session_state.get('my_posts'):
+        st.markdown("### 📮 あなたの投稿の送信状況")
+        my_posts = st.session_state.my_posts[-5:]
+        delivery = get_outbox().status([p['post_id'] for p in my_posts])
+        for my_post in reversed(my_posts):
+            # アウトボックスに無いのは、送信済みになって古くなり削除された投稿
+            status, attempts, _ = delivery.get(my_post['post_id'], (SENT, 0, None))
+            preview = my_post['text'][:20] + ('…' if len(my_post['text']) > 20 else '')
+            if status == SENT:
+                st.success(f"✅ 共有済み: {preview}")
+            elif attempts:
+                st.warning(f"🔁 再送中（{attempts}回失敗）: {preview}")
+            else:
+                st.info(f"📤 送信待ち: {preview}")
+    
     # 使い方ガイド
     st.markdown("---")
     st.markdown("### 📱 使い方ガイド")
@@ -947,23 +1463,70 @@ with left_col:
     - 模擬授業、学科説明、データサイエンス体験コーナー、学生スタッフ、施設などについて書いてみてください
     """)
 
-# 右側：投稿一覧
-with right_col:
+def show_more_posts(feed_limit):
+    """「もっと見る」: 表示件数を1ページ分増やす（ボタンのコールバック）"""
+    st.session_state.feed_limit = feed_limit + FEED_PAGE_SIZE
+
+def render_feed_cards(recent_posts, card_scope):
+    """投稿カードをまとめて1回のst.markdownで表示する"""
+    # 現在時刻を一度だけ取得
+    current_time = time.time()
+    
+    cards = []
+    for post in recent_posts:
+        post_time = post['time']
+        
+        # 時間差計算（固定時刻を使用）
+        total_seconds = max(0, int(current_time - post['epoch']))  # 負の値を防ぐ
+        if total_seconds < 60:
+            time_str = f"{total_seconds}秒前"
+        elif total_seconds < 3600:
+            minutes = total_seconds // 60
+            time_str = f"{minutes}分前"
+        elif total_seconds < 86400:
+            hours = total_seconds // 3600
+            time_str = f"{hours}時間前"
+        else:
+            time_str = post_time.strftime('%m/%d %H:%M')
+        
+        # カードのHTMLは投稿ごとにキャッシュし、経過時間だけを差し込む
+        head, tail = build_post_card((card_scope, post_key(post), bool(post.get('pending'))), post)
+        cards.append(head + time_str + tail)
+    
+    st.markdown(''.join(cards), unsafe_allow_html=True)
+
+# 右側：投稿一覧（自動更新ではこのフラグメントだけを再実行し、入力中のフォームは中断しない）
+@st.fragment(run_every=st.session_state.update_interval if st.session_state.auto_update_enabled else None)
+def show_feed():
+    """統計・投稿一覧・グラフ"""
+    snapshot = load_snapshot()
+    posts = snapshot.posts
+    post_table = snapshot.table
+    total_posts = len(posts)
+    
     # ヘッダーに手動更新ボタンを配置
     col_title, col_refresh = st.columns([3, 1])
     with col_title:
         st.subheader("🌟 みんなの感想")
     with col_refresh:
         if st.button("🔄 更新", help="最新の感想を取得", key="posts_refresh"):
-            load_posts.clear()
+            refresh_posts()
             st.session_state.last_update = datetime.now()
             # rerunを削除
             st.success("✅ 更新完了")
     
+    if GAS_URL and snapshot.synced_at is None and posts:
+        # 初回の全件取得が終わるまでは、ポーリングスレッドが先に読んだ新しい順の1ページだけを表示する
+        st.markdown("### 💬 最新の感想（新しい順）")
+        recent_posts, _ = snapshot.feed.page(FEED_PAGE_SIZE)
+        render_feed_cards(recent_posts, data_key(snapshot)[0])
+        st.caption("⏳ すべての感想を読み込んでいます…")
+        return
+    
     if posts:
         # 統計
-        avg_score = sum(p['sentiment'] for p in posts) / total_posts
-        satisfied_count = len([p for p in posts if p['sentiment'] >= 60])
+        avg_score = post_table.mean_score()
+        satisfied_count = post_table.count_score_at_least(60)
         
         st.markdown("### 📊 参加者の声")
         
@@ -976,123 +1539,22 @@ with right_col:
             satisfaction_rate = (satisfied_count / total_posts) * 100
             st.metric("満足率", f"{satisfaction_rate:.0f}%")
         
-        # 投稿一覧（最新10件）- 新しいものを上に表示
+        # 投稿一覧（最新10件から「もっと見る」で追加）- 新しいものを上に表示
         st.markdown("### 💬 最新の感想（新しい順）")
         
-        # 時刻でソート
-        for post in posts:
-            if not isinstance(post.get('time'), datetime):
-                try:
-                    if isinstance(post.get('time'), str):
-                        time_str = post['time'].replace('Z', '')
-                        if '.' in time_str:
-                            post['time'] = datetime.fromisoformat(time_str.split('.')[0])
-                        else:
-                            post['time'] = datetime.fromisoformat(time_str)
-                    else:
-                        post['time'] = datetime.now()
-                except:
-                    post['time'] = datetime.now()
-        
-        # 新しい順にソート（降順）- 正確なソート
-        try:
-            recent_posts = sorted(
-                posts, 
-                key=lambda x: x.get('time', datetime.min) if isinstance(x.get('time'), datetime) else datetime.min, 
-                reverse=True
-            )[:10]
-        except Exception as sort_error:
-            # ソートエラー時はそのまま使用
-            recent_posts = posts[:10]
+        # 新しい順の並びはスナップショット作成時に1回だけ作られている（ここでは必要な件数だけ取り出す）
+        feed_limit = st.session_state.get('feed_limit', FEED_PAGE_SIZE)
+        recent_posts, next_cursor = snapshot.feed.page(feed_limit)
         
-        # 現在時刻を一度だけ取得
-        current_time = datetime.now()
+        render_feed_cards(recent_posts, data_key(snapshot)[0])
         
-        for i, post in enumerate(recent_posts):
-            post_time = post.get('time')
-            
-            # 時刻データの正規化
-            if isinstance(post_time, str):
-                try:
-                    time_str = post_time.replace('Z', '')
-                    if '.' in time_str:
-                        post_time = datetime.fromisoformat(time_str.split('.')[0])
-                    else:
-                        post_time = datetime.fromisoformat(time_str)
-                except:
-                    post_time = datetime.now()
-            elif not isinstance(post_time, datetime):
-                post_time = datetime.now()
-            
-            # 時間差計算（固定時刻を使用）
-            diff = current_time - post_time
-            
-            # より正確な時間表示
-            total_seconds = max(0, int(diff.total_seconds()))  # 負の値を防ぐ
-            if total_seconds < 60:
-                time_str = f"{total_seconds}秒前"
-            elif total_seconds < 3600:
-                minutes = total_seconds // 60
-                time_str = f"{minutes}分前"
-            elif total_seconds < 86400:
-                hours = total_seconds // 3600
-                time_str = f"{hours}時間前"
-            else:
-                time_str = post_time.strftime('%m/%d %H:%M')
-            
-            # 分析理由やキーワード、使用モデルの表示（改善版）
-            analysis_info = ""
-            if post.get('reason'):
-                analysis_info += f"<div class='post-analysis'>💭 {post['reason']}</div>"
-            if post.get('keywords') and len(post['keywords']) > 0:
-                keywords_str = ', '.join(post['keywords'][:3])
-                analysis_info += f"<div class='post-analysis'>🔍 {keywords_str}</div>"
-            
-            # 使用AIモデルの表示（model_usedフィールドを優先使用）
-            if post.get('model_used'):
-                # 新しいmodel_usedフィールドがある場合
-                model_used = post['model_used']
-                if model_used == "Gemini 2.5":
-                    analysis_info += f"<div class='post-analysis'>🤖 Gemini 2.5で分析</div>"
-                elif model_used == "Gemini 2.0":
-                    analysis_info += f"<div class='post-analysis'>🤖 Gemini 2.0で分析</div>"
-                elif model_used == "Gemini AI":
-                    analysis_info += f"<div class='post-analysis'>🤖 Gemini AIで分析</div>"
-                elif model_used == "基本分析":
-                    analysis_info += f"<div class='post-analysis'>⚙️ 基本分析で処理</div>"
-                else:
-                    analysis_info += f"<div class='post-analysis'>🤖 {model_used}で分析</div>"
-            elif post.get('reason'):
-                # 古い投稿でmodel_usedがない場合、reasonから推測
-                reason_text = post['reason']
-                
-                # reasonからの推測（フォールバック）
-                if "gemini" in reason_text.lower() and "フォールバック" not in reason_text:
-                    analysis_info += f"<div class='post-analysis'>🤖 Gemini AIで分析</div>"
-                elif "フォールバック" in reason_text or "キーワードベース" in reason_text:
-                    analysis_info += f"<div class='post-analysis'>⚙️ 基本分析で処理</div>"
-                else:
-                    analysis_info += f"<div class='post-analysis'>🤖 AI分析</div>"
-            else:
-                # reasonもない古い投稿
-                analysis_info += f"<div class='post-analysis'>🤖 AI分析（詳細不明）</div>"
-            
-            # スマホ対応投稿表示（HTMLの改善）
-            st.markdown(f"""
-            <div class="post-card" style="--border-color: {post['color']};">
-                <div class="post-header">
-                    <span class="post-user">👤 {post['user']}</span>
-                    <span class="post-time">⏰ {time_str}</span>
-                </div>
-                <div class="post-emotion" style="color: {post['color']};">
-                    {post['emotion']} ({post['sentiment']}点)
-                </div>
-                <div class="post-text">
-                    💬 {post['text']}
-                </div>
-                {analysis_info}
-            </div>
-            """, unsafe_allow_html=True)
+        # 古い感想を追加で表示
+        if next_cursor is not None:
+            # 件数はコールバックで増やす（クリック後のフラグメントの再実行で反映される）
+            st.button(
+                f"⬇️ もっと見る（{total_posts - len(recent_posts)}件）", key="feed_more", use_container_width=True,
+                on_click=show_more_posts, args=(feed_limit,)
+            )
         
         # グラフ表示（スマホ対応・操作説明付き）
         if len(posts) > 2:
@@ -1112,48 +1574,13 @@ with right_col:
                 - **ダブルクリック**: 元の表示に戻る
                 """)
             
-            df = pd.DataFrame(posts)
-            df = df.sort_values('time')
-            df['感想順'] = range(1, len(df) + 1)
+            # グラフのデータと図はデータのバージョンごとに1回だけ作り、全セッションで共有する
+            chart_key = data_key(snapshot)
+            df, emotion_counts = build_chart_data(chart_key, post_table)
             
             # スマホ対応のグラフ設定（エラー修正）
             try:
-                fig = go.Figure()
-                
-                # 満足度ラインの追加
-                fig.add_hline(y=50, line_dash="dash", line_color="gray", 
-                             annotation_text="普通(50点)", annotation_position="bottom right")
-                fig.add_hline(y=60, line_dash="dot", line_color="green", 
-                             annotation_text="満足ライン(60点)", annotation_position="top right")
-                
-                # メインデータの追加
-                fig.add_trace(go.Scatter(
-                    x=df['感想順'],
-                    y=df['sentiment'],
-                    mode='lines+markers',
-                    name='満足度スコア',
-                    line=dict(color='#1f77b4', width=3),
-                    marker=dict(size=8, color='#1f77b4'),
-                    hovertemplate='<b>%{customdata[0]}</b><br>' +
-                                 '満足度: %{y}点<br>' +
-                                 '感想: %{customdata[1]}<extra></extra>',
-                    customdata=df[['user', 'text']].values
-                ))
-                
-                # スマホ対応レイアウト（エラー対策）
-                fig.update_layout(
-                    title='参加者の満足度スコア推移（AI分析）',
-                    height=400,
-                    yaxis_title="満足度スコア",
-                    xaxis_title="投稿順",
-                    showlegend=False,
-                    dragmode='pan',
-                    margin=dict(l=50, r=20, t=50, b=50)
-                )
-                
-                # Y軸の範囲を固定（0-100）
-                fig.update_yaxes(range=[0, 100])
-                
+                fig = build_score_figure(chart_key, df)
                 st.plotly_chart(fig, use_container_width=True, config={
                     'displayModeBar': False,  # ツールバーを非表示にしてエラー回避
                     'displaylogo': False
@@ -1167,25 +1594,8 @@ with right_col:
             
             # 感情の分布（簡単操作・エラー対策）
             st.markdown("### 🎭 満足度分布")
-            emotion_counts = df['emotion'].value_counts()
-            
             try:
-                fig2 = go.Figure(data=[go.Pie(
-                    labels=emotion_counts.index,
-                    values=emotion_counts.values,
-                    hole=0.3,
-                    textinfo='label+percent',
-                    textposition='outside'
-                )])
-                
-                fig2.update_layout(
-                    title="参加者の満足度分布（AI分析）",
-                    height=400,
-                    showlegend=True,
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.2),
-                    margin=dict(l=20, r=20, t=50, b=50)
-                )
-                
+                fig2 = build_emotion_figure(chart_key, emotion_counts)
                 st.plotly_chart(fig2, use_container_width=True, config={
                     'displayModeBar': False,
                     'displaylogo': False
@@ -1200,10 +1610,10 @@ with right_col:
             st.markdown("### 📈 かんたん統計")
             col_stats1, col_stats2 = st.columns(2)
             with col_stats1:
-                st.info(f"**最高スコア**: {df['sentiment'].max()}点")
-                st.info(f"**最低スコア**: {df['sentiment'].min()}点")
+                st.info(f"**最高スコア**: {df['sentiment'].max():.0f}点")
+                st.info(f"**最低スコア**: {df['sentiment'].min():.0f}点")
             with col_stats2:
-                st.info(f"**スコア幅**: {df['sentiment'].max() - df['sentiment'].min()}点")
+                st.info(f"**スコア幅**: {df['sentiment'].max() - df['sentiment'].min():.0f}点")
                 high_satisfaction = (df['sentiment'] >= 80).sum()
                 st.info(f"**高満足(80点以上)**: {high_satisfaction}人")
     
@@ -1247,13 +1657,8 @@ with right_col:
         AIがあなたの感情を詳しく分析してくれます。
         """)
 
-# 自動更新処理（非ブロッキング・rerun削除）
-if st.session_state.auto_update_enabled:
-    time_since_update = (datetime.now() - st.session_state.last_update).total_seconds()
-    if time_since_update >= 30:
-        # 自動更新はキャッシュクリアのみで、rerunはしない
-        load_posts.clear()
-        st.session_state.last_update = datetime.now()
+with right_col:
+    show_feed()
 
 # フッター
 st.markdown("---")
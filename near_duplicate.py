@@ -0,0 +1,132 @@
+"""直近の投稿の類似検索（MinHash + LSH）
+
+コピペや一部だけ書き換えた連投を検出し、近い投稿の分析結果を再利用するための索引。
+Streamlitに依存しないので、アプリ側では st.cache_resource で1つだけ作って共有する。
+"""
+import re
+import threading
+import time
+import zlib
+
+# MinHash用のハッシュ関数（a * x + b) mod p の係数
+_MERSENNE_PRIME = (1 << 61) - 1
+_NUM_PERMUTATIONS = 32
+_BANDS = 8
+_ROWS_PER_BAND = _NUM_PERMUTATIONS // _BANDS
+_PERMUTATIONS = [
+    (1 + (i * 0x9E3779B1) % (_MERSENNE_PRIME - 1), (i * 0x85EBCA77 + 0xC2B2AE3D) % _MERSENNE_PRIME)
+    for i in range(1, _NUM_PERMUTATIONS + 1)
+]
+
+# 類似判定で無視する記号・空白
+_NORMALIZE_PATTERN = re.compile(r"[\s!！?？。、,.，．~〜ー…・「」『』()（）]+")
+
+
+def normalize_text(text):
+    """比較用にテキストを正規化（記号・空白を除去して小文字化）"""
+    return _NORMALIZE_PATTERN.sub("", text or "").lower()
+
+
+def shingles(text, size=3):
+    """文字n-gram（シングル）の集合を作成"""
+    normalized = normalize_text(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def minhash_signature(shingle_set):
+    """シングル集合からMinHash署名を計算"""
+    if not shingle_set:
+        return (0,) * _NUM_PERMUTATIONS
+    bases = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    return tuple(
+        min((a * x + b) % _MERSENNE_PRIME for x in bases)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(a, b):
+    """2つの集合のJaccard係数（どちらかが空なら0。絵文字や記号だけの投稿は何とも似ていないものとする）"""
+    if not a or not b:
+        return 0.0
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class NearDuplicateIndex:
+    """直近の投稿だけを保持するスライディングウィンドウ型の類似索引（スレッドセーフ）"""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = {}  # entry_id -> (shingles, signature, analysis, user, added_at)（追加順）
+        self._buckets = {}  # (band, band_hash) -> set(entry_id)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, signature):
+        return [
+            (band, hash(signature[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]))
+            for band in range(_BANDS)
+        ]
+
+    def add(self, text, analysis=None, user=None):
+        """投稿を索引に追加（古いものはウィンドウから押し出される）"""
+        shingle_set = shingles(text)
+        signature = minhash_signature(shingle_set)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (shingle_set, signature, analysis, user, time.time())
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id = next(iter(self._entries))
+        _, signature, _, _, _ = self._entries.pop(entry_id)
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _candidates(self, signature):
+        candidate_ids = set()
+        for key in self._band_keys(signature):
+            candidate_ids |= self._buckets.get(key, set())
+        return [self._entries[entry_id] for entry_id in candidate_ids]
+
+    def query(self, text, threshold=0.8, with_analysis=False):
+        """最も似ている投稿を返す（(類似度, 分析結果, ユーザー) または None）"""
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        signature = minhash_signature(shingle_set)
+        best = None
+        with self._lock:
+            for entry_shingles, _, analysis, user, _ in self._candidates(signature):
+                if with_analysis and analysis is None:
+                    continue
+                similarity = jaccard(shingle_set, entry_shingles)
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, analysis, user)
+        return best
+
+    def count_similar_by_user(self, user, text, threshold=0.8, within_seconds=300):
+        """同じユーザーが最近投稿した似た内容の件数（連投制限用）"""
+        shingle_set = shingles(text)
+        signature = minhash_signature(shingle_set)
+        since = time.time() - within_seconds
+        with self._lock:
+            return sum(
+                1
+                for entry_shingles, _, _, entry_user, added_at in self._candidates(signature)
+                if entry_user == user and added_at >= since
+                and jaccard(shingle_set, entry_shingles) >= threshold
+            )
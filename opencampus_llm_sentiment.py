@@ -3,8 +3,11 @@ import pandas as pd
 import plotly.express as px
 from datetime import datetime
 import json
-import requests
+from gas_client import GasClient
+from post_export import EXPORT_FORMATS, export_callable
+from post_store import SingleFlightLoader
 import time
+import random
 import google.generativeai as genai
 
 # ページ設定
@@ -199,33 +202,52 @@ def simple_sentiment_analysis_fallback(text):
 # Google Apps Script URL
 GAS_URL = st.secrets.get("gas_url", "")
 
+@st.cache_resource
+def get_gas_client():
+    """GAS通信用の共有クライアント（接続を使い回す）"""
+    return GasClient(
+        pool_size=int(st.secrets.get("gas_pool_size", 10)),
+        max_retries=int(st.secrets.get("gas_max_retries", 3)),
+        backoff_factor=float(st.secrets.get("gas_backoff_factor", 0.5))
+    )
+
+# 投稿の再取得間隔（秒）。この間は全セッションで同じ投稿を使う
+POSTS_REFRESH_SECONDS = 10
+
+def fetch_posts():
+    """GASから全投稿を取得し、時刻をdatetimeに変換（失敗時は例外）"""
+    response = get_gas_client().get(GAS_URL, timeout=10)
+    response.raise_for_status()
+    posts = response.json()
+    for post in posts:
+        if post.get('time'):
+            try:
+                if isinstance(post['time'], str):
+                    time_str = post['time'].replace('Z', '')
+                    if '.' in time_str:
+                        post['time'] = datetime.fromisoformat(time_str.split('.')[0])
+                    else:
+                        post['time'] = datetime.fromisoformat(time_str)
+                elif not isinstance(post['time'], datetime):
+                    post['time'] = datetime.now()
+            except:
+                post['time'] = datetime.now()
+        else:
+            post['time'] = datetime.now()
+    return tuple(posts)
+
+@st.cache_resource
+def get_post_loader():
+    """GASからの読み込みを1つにまとめるローダー（全セッション共有。取得中は他のセッションに前回の投稿を返す）"""
+    return SingleFlightLoader(fetch_posts)
+
 def load_posts():
-    """投稿を読み込み"""
+    """投稿を読み込み（POSTS_REFRESH_SECONDS秒に1回だけ1セッションが取得する。返り値は共有されるため変更しないこと）"""
     if not GAS_URL:
         return st.session_state.get('posts', [])
-    
     try:
-        response = requests.get(GAS_URL, timeout=10)
-        if response.status_code == 200:
-            posts = response.json()
-            for post in posts:
-                if post.get('time'):
-                    try:
-                        if isinstance(post['time'], str):
-                            time_str = post['time'].replace('Z', '')
-                            if '.' in time_str:
-                                post['time'] = datetime.fromisoformat(time_str.split('.')[0])
-                            else:
-                                post['time'] = datetime.fromisoformat(time_str)
-                        elif not isinstance(post['time'], datetime):
-                            post['time'] = datetime.now()
-                    except:
-                        post['time'] = datetime.now()
-                else:
-                    post['time'] = datetime.now()
-            return posts
-        return []
-    except:
+        return get_post_loader().get(int(time.time() // POSTS_REFRESH_SECONDS))
+    except Exception:
         return st.session_state.get('posts', [])
 
 def save_post(nickname, text, score, emotion, reason, keywords, color):
@@ -243,8 +265,12 @@ def save_post(nickname, text, score, emotion, reason, keywords, color):
     
     if GAS_URL:
         try:
-            response = requests.post(GAS_URL, json=post_data, timeout=10)
-            return response.status_code == 200
+            response = get_gas_client().post(GAS_URL, json=post_data, timeout=10)
+            success = response.status_code == 200
+            if success:
+                # 全件を取り直さず、読み込み済みの投稿に自分の投稿を加えて表示する
+                get_post_loader().insert(dict(post_data, time=datetime.now()))
+            return success
         except:
             return False
     else:
@@ -260,13 +286,14 @@ def clear_all_posts():
     if GAS_URL:
         try:
             clear_url = GAS_URL + "?action=clear"
-            response = requests.get(clear_url, timeout=10)
+            response = get_gas_client().get(clear_url, timeout=10)
             
             if response.status_code == 200:
                 if 'posts' in st.session_state:
                     del st.session_state['posts']
                 if 'confirm_clear' in st.session_state:
                     del st.session_state['confirm_clear']
+                get_post_loader().invalidate()
                 return True
             return False
         except:
@@ -300,13 +327,15 @@ with col_status2:
 
 # 自動更新
 auto_update = st.checkbox("🔄 自動更新（15秒ごと）", value=True)
+if 'update_interval' not in st.session_state:
+    # 更新間隔はセッションごとにずらす（全員が同時に再読み込みしないように）
+    st.session_state.update_interval = random.uniform(12, 18)
+# 自動更新では集計と投稿一覧のフラグメントだけを再実行する（入力中のフォームは中断しない）
+refresh_every = st.session_state.update_interval if auto_update else None
 
-# サイドバー
-with st.sidebar:
-    st.markdown("## 🎯 オープンキャンパス感想SNS")
-    st.markdown("**AI powered by Gemini 2.0**")
-    
-    st.markdown("## 📊 現在の状況")
+@st.fragment(run_every=refresh_every)
+def show_status():
+    """サイドバーの現在の状況"""
     posts = load_posts()
     total_posts = len(posts)
     st.metric("参加者の感想", f"{total_posts}件")
@@ -322,6 +351,14 @@ with st.sidebar:
             st.success("🧠 高精度AI分析中")
         else:
             st.warning("⚙️ 基本分析モード")
+
+# サイドバー
+with st.sidebar:
+    st.markdown("## 🎯 オープンキャンパス感想SNS")
+    st.markdown("**AI powered by Gemini 2.0**")
+    
+    st.markdown("## 📊 現在の状況")
+    show_status()
     
     st.markdown("---")
     st.markdown("## ⚙️ 管理機能")
@@ -360,13 +397,18 @@ with st.sidebar:
                 st.rerun()
         
         # データエクスポート
+        posts = load_posts()
         if posts:
-            export_data = json.dumps(posts, ensure_ascii=False, indent=2, default=str)
+            # ボタンが押されたときにだけファイルを作成
+            export_format = st.selectbox(
+                "ファイル形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+            )
+            _, export_mime, export_extension = EXPORT_FORMATS[export_format]
             st.download_button(
                 "📄 感想データをダウンロード",
-                data=export_data,
-                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                mime="application/json"
+                data=export_callable(posts, export_format),
+                file_name=f"opencampus_feedback_{datetime.now().strftime('%Y%m%d_%H%M')}{export_extension}",
+                mime=export_mime
             )
     
     st.markdown("---")
@@ -465,12 +507,16 @@ with left_col:
                 st.error("❌ 投稿に失敗しました。もう一度お試しください。")
 
 # 右側：投稿一覧
-with right_col:
+@st.fragment(run_every=refresh_every)
+def show_posts():
+    """みんなの感想（統計・一覧・グラフ）"""
     st.subheader("🌟 みんなの感想")
     
-    if st.button("🔄 最新の感想を見る"):
-        st.rerun()
+    # 押すとこの一覧だけが再実行される
+    st.button("🔄 最新の感想を見る")
     
+    posts = load_posts()
+    total_posts = len(posts)
     if posts:
         # 統計
         avg_score = sum(p['sentiment'] for p in posts) / total_posts
@@ -618,10 +664,8 @@ with right_col:
         AIがあなたの感情を詳しく分析してくれます。
         """)
 
-# 自動更新
-if auto_update:
-    time.sleep(15)
-    st.rerun()
+with right_col:
+    show_posts()
 
 # フッター
 st.markdown("---")
@@ -0,0 +1,182 @@
+"""投稿の送信待ちキュー（SQLiteによる永続アウトボックス）
+
+投稿はまずローカルのSQLiteに書き込んでfsyncし、すぐに「受け付けた」と返す。
+GASへの送信はバックグラウンドの1スレッドがまとめて行うため、
+送信中にスクリプトの実行が中断されても投稿は失われない。
+
+各投稿には冪等キー（post_id）を付けて送る。再送しても重複しないのは、
+GAS側で同じpost_idの行を追加しないようにしてある場合（?action=bulk に対応したGASなど）だけ。
+post_idを見ない従来のGASに1件ずつ送る場合、応答を受け取れずに再送すると行が重複することがある。
+
+送信済みの行は sent_retention 秒たつと送信スレッドが削除する（ファイルが大きくなり続けないように）。
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# 送信状態
+PENDING = 'pending'
+SENT = 'sent'
+
+
+class PostOutbox:
+    """投稿の永続アウトボックスと送信スレッド（スレッドセーフ）
+
+    send_batch(posts) は送信できた投稿のpost_idの集合を返す。
+    例外を投げた場合はバッチ全体を後で再送する。
+    """
+
+    def __init__(self, path, send_batch, batch_size=20, interval=2.0, max_backoff=60.0, on_delivered=None,
+                 sent_retention=24 * 3600, prune_interval=600):
+        self.path = path
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.on_delivered = on_delivered
+        self.sent_retention = sent_retention
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + synchronous=FULL でコミットごとにfsyncする
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                post_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                last_error TEXT
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, created_at)')
+        self._conn.commit()
+
+    def start(self):
+        """送信スレッドを開始（二重起動はしない）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="post-outbox-sender", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, post):
+        """投稿を永続化して冪等キーを返す（送信は後でまとめて行う）"""
+        post = dict(post)
+        post_id = post.get('post_id') or uuid.uuid4().hex
+        post['post_id'] = post_id
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO outbox (post_id, payload, status, created_at) VALUES (?, ?, ?, ?)',
+                (post_id, json.dumps(post, ensure_ascii=False, default=str), PENDING, time.time())
+            )
+            self._conn.commit()
+        self._wakeup.set()
+        return post_id
+
+    def status(self, post_ids):
+        """post_idごとの送信状態 {post_id: (status, attempts, last_error)}（削除済みの送信済み行は含まない）"""
+        if not post_ids:
+            return {}
+        placeholders = ','.join('?' * len(post_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT post_id, status, attempts, last_error FROM outbox WHERE post_id IN ({placeholders})',
+                list(post_ids)
+            ).fetchall()
+        return {post_id: (status, attempts, last_error) for post_id, status, attempts, last_error in rows}
+
+    def pending_posts(self):
+        """未送信の投稿（古い順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT payload FROM outbox WHERE status = ? ORDER BY created_at', (PENDING,)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def prune_sent(self, older_than=None):
+        """送信済みになってからolder_than秒（既定はsent_retention）たった行を削除し、件数を返す"""
+        if older_than is None:
+            older_than = self.sent_retention
+        with self._lock:
+            deleted = self._conn.execute(
+                'DELETE FROM outbox WHERE status = ? AND sent_at < ?', (SENT, time.time() - older_than)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def counts(self):
+        """状態ごとの件数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall()
+        return dict(rows)
+
+    def _next_batch(self):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT post_id, payload FROM outbox WHERE status = ? ORDER BY created_at LIMIT ?',
+                (PENDING, self.batch_size)
+            ).fetchall()
+        return [json.loads(payload) for _, payload in rows]
+
+    def flush_once(self):
+        """未送信の投稿を1バッチ送信し、送信できた件数を返す"""
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        batch_ids = [post['post_id'] for post in batch]
+        try:
+            delivered = set(self.send_batch(batch))
+            error = None
+        except Exception as send_error:
+            delivered = set()
+            error = str(send_error)
+
+        now = time.time()
+        with self._lock:
+            for post_id in batch_ids:
+                if post_id in delivered:
+                    self._conn.execute(
+                        'UPDATE outbox SET status = ?, sent_at = ?, last_error = NULL WHERE post_id = ?',
+                        (SENT, now, post_id)
+                    )
+                else:
+                    self._conn.execute(
+                        'UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE post_id = ?',
+                        (error or '送信失敗', post_id)
+                    )
+            self._conn.commit()
+
+        if delivered and self.on_delivered:
+            self.on_delivered(delivered)
+        if error is not None or len(delivered) < len(batch_ids):
+            raise RuntimeError(error or '一部の投稿を送信できませんでした')
+        return len(delivered)
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            if time.time() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.time()
+                try:
+                    self.prune_sent()
+                except sqlite3.Error:
+                    pass  # 次の周期で再試行する
+            try:
+                sent = self.flush_once()
+                backoff = self.interval
+                if sent:
+                    continue  # まだ残っていれば続けて送る
+            except Exception:
+                # 失敗が続くほど間隔をあける
+                backoff = min(self.max_backoff, backoff * 2)
+            self._wakeup.wait(backoff)
+            self._wakeup.clear()
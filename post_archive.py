@@ -0,0 +1,132 @@
+"""古い投稿の圧縮アーカイブ（updated_app_code.py用）
+
+保存期間を過ぎた投稿は共有ストア（SQLite / 追記型ログ）から取り除き、
+投稿日ごとのgzip圧縮ファイル（1件1行のJSON）に移す。
+共有ストアには最近の投稿だけが残るため、毎回の集計やグラフは小さいまま保たれる。
+
+ファイル構成（directory="post_archive" の場合）:
+- post_archive/posts-2025-08-16.jsonl.gz : 2025-08-16 に投稿された分
+  アーカイブするたびにgzipのメンバーを末尾に追加する（gzip.openでまとめて読める）
+
+ストアから消す前にアーカイブへ書き込むため、途中で止まっても投稿は失われない
+（同じ投稿が二重にアーカイブされることはあり、読み込み時に1件にまとめる）。
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+
+def _encode(post):
+    post = dict(post)
+    if isinstance(post.get('time'), datetime):
+        post['time'] = post['time'].isoformat()
+    return json.dumps(post, ensure_ascii=False) + '\n'
+
+
+def _decode(line):
+    post = json.loads(line)
+    post['time'] = datetime.fromisoformat(post['time'])
+    return post
+
+
+def _post_time(post):
+    value = post['time']
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _archive_key(post):
+    """二重にアーカイブされた投稿を見分けるキー"""
+    if post.get('id') is not None:
+        return ('id', post['id'])
+    return ('content', post.get('user'), post.get('text'), post['time'].isoformat())
+
+
+class PostArchive:
+    """投稿日ごとの圧縮セグメントへの追加と検索"""
+
+    PREFIX = 'posts-'
+    SUFFIX = '.jsonl.gz'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, day):
+        return os.path.join(self.directory, f"{self.PREFIX}{day}{self.SUFFIX}")
+
+    def append(self, posts):
+        """投稿を投稿日ごとのセグメントに追加し、追加した件数を返す（ディスクに書き込むまで戻らない）"""
+        by_day = {}
+        for post in posts:
+            by_day.setdefault(_post_time(post).strftime('%Y-%m-%d'), []).append(_encode(post))
+        for day, lines in by_day.items():
+            with open(self._segment_path(day), 'ab') as f:
+                f.write(gzip.compress(''.join(lines).encode('utf-8')))
+                f.flush()
+                os.fsync(f.fileno())
+        return sum(len(lines) for lines in by_day.values())
+
+    def segments(self):
+        """セグメントの一覧 [(日付, 圧縮後のバイト数), ...]（新しい順）"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX):
+                day = name[len(self.PREFIX):-len(self.SUFFIX)]
+                segments.append((day, os.path.getsize(os.path.join(self.directory, name))))
+        return sorted(segments, reverse=True)
+
+    def read(self, day):
+        """1日分の投稿（投稿順・二重にアーカイブされた分は1件にまとめる）"""
+        posts = {}
+        try:
+            with gzip.open(self._segment_path(day), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        post = _decode(line)
+                        posts[_archive_key(post)] = post
+        except FileNotFoundError:
+            return []
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            pass  # 追加中のメンバーは次回読む（読めたところまで返す）
+        return sorted(posts.values(), key=lambda post: post['time'])
+
+    def query(self, start=None, end=None, keyword=None, limit=500):
+        """start〜endの日付（dateまたは'YYYY-MM-DD'、両端を含む）の投稿を新しい順にlimit件まで
+
+        対象の日付のセグメントだけを読み、keywordを指定すると本文か名前に含むものに絞る。
+        """
+        start = str(start) if start else None
+        end = str(end) if end else None
+        results = []
+        for day, _ in self.segments():
+            if (start and day < start) or (end and day > end):
+                continue
+            for post in reversed(self.read(day)):
+                if keyword and keyword not in post.get('text', '') and keyword not in post.get('user', ''):
+                    continue
+                results.append(post)
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+def start_archiver(store, archive, retention_days=7, interval=3600):
+    """retention_days日より古い投稿をinterval秒ごとにstoreからarchiveへ移すスレッドを開始
+
+    storeは archive_older_than(cutoff, archive) を持つ SQLitePostStore / JsonlPostStore。
+    """
+    def run():
+        while True:
+            try:
+                store.archive_older_than(datetime.now() - timedelta(days=retention_days), archive)
+            except Exception:
+                pass  # 次の周期で再試行する
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="post-archiver", daemon=True)
+    thread.start()
+    return thread
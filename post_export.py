@@ -0,0 +1,112 @@
+"""投稿データのエクスポート（ダウンロードされたときだけ作成する）
+
+st.download_button の data に関数を渡すと、ボタンが押されたときに初めて呼ばれる。
+ここではその関数を作る。投稿は1件ずつ文字列にしてジェネレータで流し、
+一時ファイルに書き出してから読み込むため、途中でDataFrameや全件分の文字列・辞書を作らない。
+
+形式: JSON / JSONL（1行1件） / CSV / 列指向JSON（列ごとの配列）
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime
+
+# 形式ごとの表示名・MIMEタイプ・拡張子
+EXPORT_FORMATS = {
+    'json': ('JSON', 'application/json', '.json'),
+    'csv': ('CSV', 'text/csv', '.csv'),
+    'jsonl': ('JSONL（1行1件）', 'application/x-ndjson', '.jsonl'),
+    'columnar': ('列指向JSON', 'application/json', '.columns.json'),
+}
+
+# CSV・列指向JSONの列（この順で出力する）
+EXPORT_COLUMNS = (
+    'user', 'text', 'sentiment', 'emotion', 'reason', 'keywords', 'model_used', 'time', 'color', 'hash', 'partition'
+)
+
+def _format_time(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    return value
+
+
+def export_record(post):
+    """1件の投稿をエクスポート用の辞書に（PostRecordと辞書の両方に対応）"""
+    if hasattr(post, 'to_wire'):
+        record = post.to_wire()
+    else:
+        record = {key: value for key, value in post.items() if key != 'epoch'}
+    record['time'] = _format_time(post.get('time'))
+    return record
+
+
+def iter_json(posts):
+    """JSON配列を1件ずつ出力"""
+    yield '['
+    for i, post in enumerate(posts):
+        yield (',\n' if i else '\n') + json.dumps(export_record(post), ensure_ascii=False, indent=2, default=str)
+    yield '\n]\n'
+
+
+def iter_jsonl(posts):
+    """1行1件のJSON"""
+    for post in posts:
+        yield json.dumps(export_record(post), ensure_ascii=False, default=str) + '\n'
+
+
+def iter_csv(posts):
+    """CSV（キーワードは「, 」区切りの1列）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for post in posts:
+        record = export_record(post)
+        keywords = record.get('keywords')
+        if isinstance(keywords, (list, tuple)):
+            record['keywords'] = ', '.join(str(keyword) for keyword in keywords)
+        writer.writerow([record.get(column, '') for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_columnar(posts):
+    """列ごとの配列 {"columns": [...], "data": {"user": [...], ...}}（列ごとに投稿をたどり直す）"""
+    yield '{"columns": ' + json.dumps(EXPORT_COLUMNS) + ', "count": ' + str(len(posts)) + ', "data": {'
+    for i, column in enumerate(EXPORT_COLUMNS):
+        yield (', ' if i else '') + json.dumps(column) + ': ['
+        for j, post in enumerate(posts):
+            value = _format_time(post.get('time')) if column == 'time' else post.get(column)
+            if isinstance(value, tuple):
+                value = list(value)
+            yield (', ' if j else '') + json.dumps(value, ensure_ascii=False, default=str)
+        yield ']'
+    yield '}}\n'
+
+
+EXPORTERS = {
+    'json': iter_json,
+    'jsonl': iter_jsonl,
+    'csv': iter_csv,
+    'columnar': iter_columnar,
+}
+
+
+def write_export(chunks):
+    """文字列のチャンクを一時ファイルに書き出し、最後に1回だけ読み込んだバイト列を返す"""
+    with tempfile.TemporaryFile() as f:
+        for chunk in chunks:
+            f.write(chunk.encode('utf-8'))
+        f.seek(0)
+        return f.read()
+
+
+def export_callable(posts, export_format):
+    """st.download_buttonのdataに渡す関数（押されたときにだけ作成する）
+
+    ボタンが押されたときはスクリプトの外から呼ばれるため、
+    st.session_stateなどは使わず、投稿の列をそのまま渡しておく。
+    """
+    exporter = EXPORTERS[export_format]
+    return lambda: write_export(exporter(posts))
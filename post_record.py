@@ -0,0 +1,130 @@
+"""投稿のコンパクトな表現（__slots__）
+
+GASから受け取った投稿は10個前後のキーを持つ辞書で、"#28a745" や "Gemini 2.5"、
+感情ラベルなどの同じ文字列が件数分だけ別々に作られる。
+共有ストアではこれを __slots__ のレコードに変換し、繰り返し出てくる文字列は
+sys.internで1つにまとめ、時刻はエポック秒だけを持つ（datetimeは表示時に作る）。
+
+画面側のコードはこれまでどおり post['text'] や post.get('reason') で読める。
+"""
+import sys
+from datetime import datetime, timezone
+
+# 値の種類が少なく、何度も繰り返し出てくる項目（internして共有する）
+INTERNED_FIELDS = ('emotion', 'color', 'model_used', 'partition')
+
+# レコードが持つ項目（これ以外のキーは extra に入れる）
+FIELDS = (
+    'user', 'text', 'sentiment', 'emotion', 'reason', 'keywords',
+    'model_used', 'epoch', 'color', 'hash', 'post_id', 'id', 'partition'
+)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _keywords(value):
+    """キーワードのタプル（Google Sheetsからは "模擬授業,楽しい" のようなカンマ区切りの文字列で返ってくる）"""
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return tuple(keyword.strip() for keyword in value.split(',') if keyword.strip())
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value,)
+
+
+class PostRecord:
+    """読み取り専用の投稿レコード（辞書と同じ読み方ができる）"""
+
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, user='', text='', sentiment=None, emotion=None, reason=None, keywords=(),
+                 model_used=None, epoch=0.0, color=None, hash=None, post_id=None, id=None,
+                 partition=None, extra=None):
+        self.user = user
+        self.text = text
+        self.sentiment = sentiment
+        self.emotion = _intern(emotion)
+        self.reason = reason
+        self.keywords = _keywords(keywords)
+        self.model_used = _intern(model_used)
+        self.epoch = epoch
+        self.color = _intern(color)
+        self.hash = hash
+        self.post_id = post_id
+        self.id = id
+        self.partition = _intern(partition)  # イベントID
+        self.extra = extra or None  # 未知の列（空なら持たない）
+
+    @classmethod
+    def from_wire(cls, post):
+        """時刻変換済み（'epoch'あり）の辞書からレコードを作る"""
+        known = {}
+        extra = {}
+        for key, value in post.items():
+            if key in FIELDS:
+                known[key] = value
+            elif key != 'time':
+                extra[key] = value
+        return cls(extra=extra, **known)
+
+    def to_wire(self):
+        """GASとやり取りする形式の辞書（時刻はUTCのISO形式）"""
+        post = {field: getattr(self, field) for field in FIELDS if field != 'epoch'}
+        post['keywords'] = list(self.keywords)
+        post['time'] = datetime.fromtimestamp(self.epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        if self.extra:
+            post.update(self.extra)
+        return {key: value for key, value in post.items() if value is not None}
+
+    @property
+    def time(self):
+        """ローカル時刻のdatetime（表示のたびに作る）"""
+        return datetime.fromtimestamp(self.epoch)
+
+    # 送信待ち（GASに届いたことをまだ確認していない）か
+    pending = False
+
+    # --- 辞書と同じ読み方 ---
+
+    def __getitem__(self, key):
+        if key == 'time':
+            return self.time
+        if key == 'pending':
+            return self.pending
+        if key in FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key == 'time' or (key in FIELDS and getattr(self, key) is not None) or bool(self.extra and key in self.extra)
+
+    def __eq__(self, other):
+        if not isinstance(other, PostRecord):
+            return NotImplemented
+        return self.pending == other.pending and all(
+            getattr(self, name) == getattr(other, name) for name in PostRecord.__slots__
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"PostRecord(user={self.user!r}, text={self.text!r}, sentiment={self.sentiment!r})"
+
+
+class PendingPostRecord(PostRecord):
+    """この端末で受け付けてGASへ送信中の投稿（GASから同じ投稿が届いたらPostRecordに置き換わる）"""
+
+    __slots__ = ()
+    pending = True
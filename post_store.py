@@ -0,0 +1,785 @@
+"""Google Apps Script（GAS）に保存された投稿のローカル集合
+
+GASとの差分同期の取り決め:
+- GET GAS_URL              : 全投稿のリスト（従来どおり）
+- GET GAS_URL?since=<cursor>: cursor以降（同じ時刻を含む）の投稿だけを返す。
+  差分に対応したGASは {"posts": [...], "cursor": "..."} の形で返す。
+  リストがそのまま返ってきた場合は、差分非対応とみなして全件で置き換える。
+
+cursorはGASが返した値をそのまま使う。GASが返さない場合は、投稿のidの最大値、
+idが無ければ時刻の最大値（ISO形式）を使う。
+
+ページ単位の取得（対応しているGASのみ）:
+- GET GAS_URL?limit=<N>&before=<id>: idがbefore未満の投稿を新しい順にN件
+  {"posts": [...], "next": <次のページのbefore、最後ならnull>}
+
+データバージョン（対応しているGASのみ）:
+- GET GAS_URL?action=version[&partition=<id>]: {"version": <投稿の追加・削除のたびに変わる値>}
+  GASはスクリプトプロパティのカウンタなどを書き込みのたびに増やして返す。
+  バージョンが前回と同じなら投稿の取得を省略する（他のレプリカでの追加・クリアも次の問い合わせで分かる）。
+  POSTの応答に "version" を含めると、投稿した側は自分の投稿のために全件を取り直さずに済む。
+
+イベント（日付・ブース）ごとの分割:
+- 投稿には "partition" にイベントIDを入れて送る
+- GET GAS_URL?partition=<id>[&since=...]: そのイベントの投稿だけを返す
+- GET GAS_URL?action=partitions         : {"partitions": ["2025-08-16", ...]}
+- GET GAS_URL?action=clear&partition=<id>: そのイベントの投稿だけを削除
+partitionの付いていない従来の投稿は、どのイベントにも属するものとして扱う:
+- ?partition=<id> の取得はそのイベントの投稿に加えて従来の投稿も返す
+- ?action=clear&partition=<id> はそのイベントの投稿と従来の投稿を削除する
+- ?action=partitions には含めない
+partitionを無視する古いGASから全件が返ってきた場合も、受け取った側で同じ規則で絞り込む。
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from post_record import PendingPostRecord, PostRecord
+from post_table import PostTable
+
+
+# ISO形式以外にGoogle Sheetsから返ってくる時刻フォーマット（タイムゾーンなし）
+SLASH_TIME_FORMATS = [
+    '%Y/%m/%d %H:%M:%S',  # "2025/08/16 13:44:03"
+    '%m/%d/%Y %H:%M:%S',  # "08/16/2025 13:44:03"（米国形式）
+]
+
+# ISO形式の末尾のタイムゾーン指定（"Z"、"+09:00"、"+0900"。日付と時刻の区切りが空白でもよい）
+TZ_SUFFIX_PATTERN = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+def local_utc_offset_seconds():
+    """このサーバーのローカル時刻とUTCの差（秒）"""
+    return datetime.now().astimezone().utcoffset().total_seconds()
+
+
+def parse_times_to_epoch(values):
+    """時刻の列をまとめてエポック秒（UTC基準のfloat配列）に変換
+
+    "Z"や"+09:00"付きはその時差で、タイムゾーンなしはローカル時刻として扱う。
+    変換できない値はNaNになる。
+    """
+    values = list(values)
+    epochs = np.full(len(values), np.nan)
+    if not values:
+        return epochs
+
+    # datetimeオブジェクトはそのまま変換（ローカル投稿など少数のみ）
+    for i, value in enumerate(values):
+        if isinstance(value, datetime):
+            epochs[i] = value.timestamp()
+
+    # 固定長の文字配列にして、書式の判定を文字位置の比較でまとめて行う
+    width = 40
+    text = np.array([v[:width] if isinstance(v, str) else '' for v in values], dtype=f'U{width}')
+    chars = text.view('U1').reshape(len(values), width)
+    lengths = np.char.str_len(text)
+    local_offset = local_utc_offset_seconds()
+
+    # ISO形式（"2025-08-16T13:44:03.000Z" など）: Zや時差はpandasがまとめて解釈する
+    is_iso = (lengths > 0) & (chars[:, 4] == '-')
+    if is_iso.any():
+        iso_text = pd.Series(text[is_iso], dtype='object')
+        parsed = pd.to_datetime(iso_text, format='ISO8601', utc=True, errors='coerce')
+        seconds = parsed.to_numpy(dtype='datetime64[ns]').astype('int64') / 1e9
+        # タイムゾーン指定の無い時刻はUTCとして解釈されるので、ローカル時刻に補正する
+        has_tz = iso_text.str.contains(TZ_SUFFIX_PATTERN).to_numpy(dtype=bool)
+        seconds = np.where(has_tz, seconds, seconds - local_offset)
+        epochs[is_iso] = np.where(parsed.notna().to_numpy(), seconds, np.nan)
+
+    # スラッシュ区切りの形式（タイムゾーンなし = ローカル時刻）
+    remaining = (lengths > 0) & ~is_iso
+    for time_format in SLASH_TIME_FORMATS:
+        if not remaining.any():
+            break
+        parsed = pd.to_datetime(pd.Series(text[remaining], dtype='object'), format=time_format, errors='coerce')
+        ok = parsed.notna().to_numpy()
+        seconds = parsed.to_numpy(dtype='datetime64[ns]').astype('int64') / 1e9 - local_offset
+        indices = np.flatnonzero(remaining)[ok]
+        epochs[indices] = seconds[ok]
+        remaining[indices] = False
+
+    return epochs
+
+
+def epoch_to_local_datetimes(epochs):
+    """エポック秒の配列をローカル時刻のdatetime（タイムゾーンなし）のリストに変換"""
+    local = pd.to_datetime(np.asarray(epochs, dtype=float) + local_utc_offset_seconds(), unit='s')
+    return list(local.to_pydatetime())
+
+
+def normalize_post_times(posts, with_datetime=True, first_seen=None):
+    """投稿の時刻をまとめて変換し、'epoch'（float）と'time'（datetime）を設定する
+
+    取り込み時に1回だけ行い、以降の処理では時刻を再解析しない。
+    with_datetime=Falseなら'epoch'だけを設定する（PostRecordに変換する場合）。
+    時刻が無い・変換できない投稿は初めて見た時刻にする。first_seen（post_key -> エポック秒の辞書）を渡すと
+    同じ投稿には毎回同じ時刻を使う（同期のたびに内容が変わったとみなされないように）。
+    """
+    if not posts:
+        return posts
+    epochs = parse_times_to_epoch(post.get('time') for post in posts)
+    missing = np.flatnonzero(np.isnan(epochs))
+    if len(missing):
+        now = time.time()
+        for i in missing.tolist():
+            epochs[i] = now if first_seen is None else first_seen.setdefault(post_key(posts[i]), now)
+    if not with_datetime:
+        for post, epoch in zip(posts, epochs.tolist()):
+            post['epoch'] = epoch
+        return posts
+    for post, epoch, local_time in zip(posts, epochs, epoch_to_local_datetimes(epochs)):
+        post['epoch'] = float(epoch)
+        post['time'] = local_time
+    return posts
+
+
+def to_records(raw_posts, first_seen=None):
+    """GASの投稿（辞書）を時刻変換してPostRecordのリストにする"""
+    return [
+        PostRecord.from_wire(post)
+        for post in normalize_post_times(raw_posts, with_datetime=False, first_seen=first_seen)
+    ]
+
+
+def post_key(post):
+    """投稿を一意に識別するキー（hash → id → 内容の順で使用）"""
+    if post.get('hash'):
+        return ('hash', post['hash'])
+    if post.get('id') is not None:
+        return ('id', post['id'])
+    return ('content', post.get('user'), post.get('text'), str(post.get('time')))
+
+
+class PostCollection:
+    """差分同期で維持する投稿の集合（スレッドセーフ・投稿はPostRecordで保持）"""
+
+    def __init__(self, full_sync_interval=30, pending_ttl=600):
+        # 他のレプリカでの削除（全件クリアなど）を拾うため、定期的に全件を取り直す
+        self.full_sync_interval = full_sync_interval
+        # 送信待ちの投稿がこの秒数たっても全件取得に現れなければ捨てる
+        # （hashを保存しないGASなど、同じ投稿として置き換わらない場合に残り続けないように）
+        self.pending_ttl = pending_ttl
+        self._pending_since = {}  # 送信待ちの投稿のpost_key -> 追加した時刻
+        self._posts = {}  # post_key -> post（追加順）
+        self._table = PostTable()  # _postsと同じ順の列指向テーブル
+        self._revision = 0  # 内容が変わるたびに増える
+        self._cursor = None
+        self._syncs_since_full = 0
+        self._first_seen = {}  # 時刻の無い投稿のpost_key -> 初めて取り込んだ時刻
+        self._lock = threading.Lock()
+
+    @property
+    def cursor(self):
+        return self._cursor
+
+    @property
+    def revision(self):
+        return self._revision
+
+    def __len__(self):
+        return len(self._posts)
+
+    def _compute_cursor(self):
+        # 送信待ちの投稿はGASにまだ無いため含めない
+        confirmed = [p for p in self._posts.values() if not p.pending]
+        ids = [p['id'] for p in confirmed if isinstance(p.get('id'), int)]
+        if ids and len(ids) == len(confirmed):
+            return max(ids)
+        if confirmed:
+            latest = max(p['epoch'] for p in confirmed)
+            return datetime.fromtimestamp(latest, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return None
+
+    def replace_all(self, raw_posts, cursor=None):
+        """全件の取得結果で置き換える"""
+        new_posts = {}
+        for post in to_records(raw_posts, self._first_seen):
+            new_posts[post_key(post)] = post
+        with self._lock:
+            # まだGASに届いていない送信待ちの投稿は、pending_ttl秒までは残す
+            now = time.time()
+            pending_since = {}
+            for key, post in self._posts.items():
+                if post.pending and key not in new_posts:
+                    added_at = self._pending_since.get(key, now)
+                    if now - added_at < self.pending_ttl:
+                        new_posts[key] = post
+                        pending_since[key] = added_at
+            self._pending_since = pending_since
+            if new_posts != self._posts:
+                self._posts = new_posts
+                self._table = PostTable.from_posts(list(new_posts.values()))
+                self._revision += 1
+            self._cursor = cursor if cursor is not None else self._compute_cursor()
+            self._syncs_since_full = 0
+
+    def merge(self, raw_posts, cursor=None):
+        """差分の取得結果を追加（既にある投稿は上書き）"""
+        records = to_records(raw_posts, self._first_seen)
+        with self._lock:
+            appended = []
+            updated = False
+            for post in records:
+                key = post_key(post)
+                existing = self._posts.get(key)
+                if existing != post:
+                    if existing is None:
+                        appended.append(post)
+                    else:
+                        updated = True
+                    self._posts[key] = post
+                    self._revision += 1
+            if updated:
+                # 既存の投稿が変わった場合だけ作り直す（通常は末尾への追加のみ）
+                self._table = PostTable.from_posts(list(self._posts.values()))
+            else:
+                self._table.extend(appended)
+            if cursor is not None:
+                self._cursor = cursor
+            elif records:
+                self._cursor = self._compute_cursor()
+            self._syncs_since_full += 1
+        return len(records)
+
+    def add_pending(self, raw_post):
+        """この端末で受け付けた投稿を送信待ちとして先に追加する（追加したらTrue）
+
+        GASから同じ投稿（hashが同じ）が届いた時点で、通常の投稿に置き換わる。
+        届かないままpending_ttl秒たった投稿は、その後の全件取得で取り除く。
+        """
+        post = PendingPostRecord.from_wire(normalize_post_times([dict(raw_post)], with_datetime=False)[0])
+        key = post_key(post)
+        with self._lock:
+            if key in self._posts:
+                return False
+            self._posts[key] = post
+            self._pending_since[key] = time.time()
+            self._table.extend([post])
+            self._revision += 1
+        return True
+
+    def next_since(self):
+        """次の同期で送るcursor（全件を取り直す場合はNone）"""
+        if self._cursor is None or self._syncs_since_full >= self.full_sync_interval:
+            return None
+        return self._cursor
+
+    def apply(self, data, since):
+        """GASの応答を反映し、受け取った投稿数を返す"""
+        if isinstance(data, dict):
+            raw_posts = data.get('posts', [])
+            if since is None:
+                self.replace_all(raw_posts, data.get('cursor'))
+                return len(raw_posts)
+            return self.merge(raw_posts, data.get('cursor'))
+
+        # リスト形式 = 差分非対応のGAS（全件が返ってくる）
+        self.replace_all(data)
+        return len(data)
+
+    def sync(self, fetch):
+        """fetch(since)で取得した結果を反映し、受け取った投稿数を返す
+
+        fetchは例外を投げてよい（集合は変更されない）。
+        """
+        since = self.next_since()
+        return self.apply(fetch(since), since)
+
+    def restore(self, posts, revision):
+        """ディスクに保存したスナップショットの投稿で初期化する（次の同期は全件取得）"""
+        with self._lock:
+            self._posts = {post_key(post): post for post in posts}
+            self._table = PostTable.from_posts(list(self._posts.values()))
+            self._revision = revision
+            self._cursor = None
+
+    def reset(self):
+        """全件クリア後などに集合を空にする"""
+        with self._lock:
+            self._posts = {}
+            self._table = PostTable()
+            self._revision += 1
+            self._cursor = None
+            self._syncs_since_full = 0
+            self._first_seen = {}
+            self._pending_since = {}
+
+    def posts(self):
+        """現在の投稿一覧（追加順のリスト）"""
+        with self._lock:
+            return list(self._posts.values())
+
+    def frozen_posts(self):
+        """現在の投稿一覧・列指向ビュー・リビジョン（スナップショット作成用）"""
+        with self._lock:
+            return tuple(self._posts.values()), self._table.view(), self._revision
+
+
+class PostFeed:
+    """新しい順に並べた投稿（表示用。ページ単位で取り出す）"""
+
+    def __init__(self, posts):
+        # 投稿はほぼ時刻順に追加されるため、整列はほぼO(件数)で済む
+        self.posts = tuple(sorted(posts, key=lambda post: post['epoch'], reverse=True))
+        self._negative_epochs = np.array([-post['epoch'] for post in self.posts], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.posts)
+
+    def page(self, limit, cursor=None):
+        """cursorより古い投稿をlimit件と、次のページのcursor（最後ならNone）を返す
+
+        cursorは (最後に表示した投稿の時刻, その時刻の投稿のうち表示済みの件数)。
+        後から新しい投稿が増えても、古い側のページはずれない。
+        """
+        start = 0
+        if cursor is not None:
+            epoch, skip = cursor
+            start = int(np.searchsorted(self._negative_epochs, -epoch, side='left')) + skip
+        end = min(start + limit, len(self.posts))
+        posts = self.posts[start:end]
+        if end >= len(self.posts) or not posts:
+            return posts, None
+        last_epoch = posts[-1]['epoch']
+        first_same = int(np.searchsorted(self._negative_epochs, -last_epoch, side='left'))
+        return posts, (last_epoch, end - first_same)
+
+
+EMPTY_FEED = PostFeed(())
+
+
+# 読み取り専用のスナップショット（postsはPostRecordのタプル。ローカルモードでは辞書のタプル）
+# tableはpostsと同じ順の列指向ビュー（集計・グラフ用）
+# feedは同じ投稿を新しい順に並べたもの（バージョンごとに1回だけ作る）
+PostSnapshot = namedtuple('PostSnapshot', ['version', 'posts', 'table', 'feed', 'synced_at', 'error'])
+
+EMPTY_SNAPSHOT = PostSnapshot(
+    version=0, posts=(), table=PostTable().view(), feed=EMPTY_FEED, synced_at=None, error=None
+)
+
+
+# スナップショットファイルの形式のバージョン（形式を変えたら増やす。違うファイルは読み込まない）
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def save_snapshot_file(path, snapshot):
+    """スナップショットの投稿をGASと同じ形式の辞書にして、圧縮してファイルに保存する
+
+    PostRecordをそのままpickleすると、クラスを変えたときに古いファイルが読めなくなるため、
+    形式のバージョン付きのJSONにする。送信待ちの投稿は保存しない
+    （アウトボックスに残っており、アプリが起動時に add_pending で戻す）。
+    """
+    data = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'version': snapshot.version,
+        'synced_at': snapshot.synced_at,
+        # 時刻はISO形式だとミリ秒に丸められるため、エポック秒もそのまま残す
+        'posts': [dict(post.to_wire(), epoch=post.epoch) for post in snapshot.posts if not post.pending],
+    }
+    compressed = zlib.compress(json.dumps(data, ensure_ascii=False, default=str).encode('utf-8'), 6)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(compressed)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot_file(path):
+    """保存したスナップショットを読み込み、投稿・集計用テーブル・表示順を作り直す
+
+    無い・壊れている・形式のバージョンが違う場合はNone。
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+        if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT_VERSION:
+            return None
+        posts = tuple(PostRecord.from_wire(post) for post in data['posts'])
+        version = int(data['version'])
+        synced_at = data.get('synced_at')
+    except (OSError, zlib.error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        return None
+    return PostSnapshot(
+        version=version, posts=posts, table=PostTable.from_posts(list(posts)).view(),
+        feed=PostFeed(posts), synced_at=synced_at, error=None
+    )
+
+
+class SharedPostStore:
+    """バックグラウンドの1スレッドだけがGASと同期し、スナップショットを公開するストア
+
+    画面側は snapshot() で最新のスナップショットを参照するだけで、通信は行わない。
+    snapshot_pathを指定すると、最後に同期できたスナップショットをファイルに保存し、
+    次の起動時はGASを待たずにそれを表示する（synced_atは保存時の時刻のまま）。
+    保存したスナップショットが無い場合、page_fetch(limit)を指定すると、初回の全件取得の前に
+    新しい順の1ページだけを取得し、synced_at=Noneの仮のスナップショットとして公開する。
+    """
+
+    def __init__(self, fetch, interval=10, full_sync_interval=30, snapshot_path=None, save_interval=30,
+                 idle_timeout=None, version_fetch=None, pending_ttl=600, page_fetch=None, first_page_size=10):
+        self.fetch = fetch
+        # page_fetch(limit)は {"posts": [...], "next": ...}（ページ非対応のGASなら全件の応答、問い合わせないならNone）
+        self.page_fetch = page_fetch
+        self.first_page_size = first_page_size
+        self.interval = interval
+        # version_fetch()がデータバージョンを返す場合、変わったときだけfetchする（Noneなら毎回fetch）
+        self.version_fetch = version_fetch
+        self._remote_version = None
+        # snapshot()がこの秒数呼ばれなければポーリングを止める（次のstart()で再開）
+        self.idle_timeout = idle_timeout
+        self._last_read = time.time()
+        self.collection = PostCollection(full_sync_interval=full_sync_interval, pending_ttl=pending_ttl)
+        self.snapshot_path = snapshot_path
+        self.save_interval = save_interval
+        self._saved_version = None
+        self._last_saved = 0.0
+        self._restored = load_snapshot_file(snapshot_path) if snapshot_path else None
+        self._snapshot = self._restored or EMPTY_SNAPSHOT
+        self._generation = 0  # reset()のたびに増える（同期中の古い結果を捨てるため）
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """同期で受け取った投稿のリストを callback(posts) に渡す（ポーリングスレッドから呼ばれる）"""
+        self._subscribers.append(callback)
+
+    def start(self):
+        """ポーリングスレッドを開始（二重起動はしない）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="post-store-poller", daemon=True)
+                self._thread.start()
+        return self
+
+    def snapshot(self):
+        """最新のスナップショット（参照の読み取りのみで一定時間）"""
+        self._last_read = time.time()
+        return self._snapshot
+
+    def request_refresh(self):
+        """次の同期を待たずにすぐ同期させる"""
+        self._wakeup.set()
+
+    def add_pending(self, post):
+        """投稿した本人にすぐ見えるよう、送信待ちの投稿をスナップショットに加えて公開する"""
+        with self._lock:
+            if self.collection.add_pending(post):
+                self._publish(error=self._snapshot.error)
+
+    def reset(self):
+        """全件クリア後に空のスナップショットを公開する"""
+        with self._lock:
+            self._generation += 1
+            self._remote_version = None
+            self.collection.reset()
+            self._publish(error=None)
+        self._restored = None
+        self._wakeup.set()
+
+    def _publish(self, error):
+        posts, table, revision = self.collection.frozen_posts()
+        current = self._snapshot
+        if current.version and revision == current.version and error == current.error:
+            # 内容が変わっていなければ同期時刻だけ更新
+            self._snapshot = current._replace(synced_at=time.time())
+            return
+        self._snapshot = PostSnapshot(
+            version=revision, posts=posts, table=table, feed=PostFeed(posts), synced_at=time.time(), error=error
+        )
+
+    def _check_version(self):
+        """データバージョンを問い合わせ、(前回と同じか, バージョン) を返す（非対応・エラーなら取得する）"""
+        if self.version_fetch is None:
+            return False, None
+        try:
+            version = self.version_fetch()
+        except Exception:
+            return False, None
+        return version is not None and version == self._remote_version, version
+
+    def sync_once(self):
+        """1回分の同期（ポーリングスレッドから呼ばれる）"""
+        generation = self._generation
+        unchanged, version = self._check_version()
+        if unchanged:
+            with self._lock:
+                if generation == self._generation:
+                    self._snapshot = self._snapshot._replace(synced_at=time.time(), error=None)
+            return
+        since = self.collection.next_since()
+        try:
+            data = self.fetch(since)
+        except Exception as fetch_error:
+            with self._lock:
+                self._snapshot = self._snapshot._replace(error=str(fetch_error))
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # 同期中にクリアされたので古い結果は捨てる
+            self.collection.apply(data, since)
+            self._remote_version = version  # 取得前のバージョン（取得中の書き込みは次回に拾う）
+            self._publish(error=None)
+        self._maybe_save()
+        received = data.get('posts', []) if isinstance(data, dict) else data
+        for callback in self._subscribers:
+            try:
+                callback(received)
+            except Exception:
+                pass  # 購読側のエラーで同期を止めない
+
+    def _load_first_page(self):
+        """初回の全件取得の前に新しい順の1ページを取得して公開する（ポーリングスレッドから呼ばれる）"""
+        generation = self._generation
+        try:
+            data = self.page_fetch(self.first_page_size)
+        except Exception:
+            return  # 通常の同期に任せる
+        if data is None:
+            return
+        if isinstance(data, dict) and 'next' in data:
+            posts = tuple(to_records(list(data.get('posts', []))))
+            with self._lock:
+                if generation == self._generation and self._snapshot.synced_at is None:
+                    self._snapshot = PostSnapshot(
+                        version=0, posts=posts, table=PostTable.from_posts(list(posts)).view(),
+                        feed=PostFeed(posts), synced_at=None, error=None
+                    )
+            return
+        # ページ非対応のGASは全件を返すので、それを初回の全件取得の結果として使う
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.collection.apply(data, None)
+            self._publish(error=None)
+
+    def _maybe_save(self):
+        """内容が変わっていれば、save_interval秒に1回までスナップショットを保存する"""
+        snapshot = self._snapshot
+        if not self.snapshot_path or snapshot.version == self._saved_version:
+            return
+        if time.time() - self._last_saved < self.save_interval:
+            return
+        try:
+            save_snapshot_file(self.snapshot_path, snapshot)
+            self._saved_version = snapshot.version
+            self._last_saved = time.time()
+        except OSError:
+            pass  # 保存できなくても同期は続ける
+
+    def _run(self):
+        restored = self._restored
+        if restored is not None:
+            # 保存済みの投稿から集合を作り直す（画面側は読み込んだスナップショットをそのまま使う）
+            with self._lock:
+                if self._restored is restored:
+                    self.collection.restore(restored.posts, restored.version)
+                    self._saved_version = restored.version
+                    self._restored = None
+        elif self.page_fetch is not None and self._snapshot.synced_at is None:
+            self._load_first_page()
+        while True:
+            self.sync_once()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self.idle_timeout and time.time() - self._last_read > self.idle_timeout:
+                with self._lock:
+                    if time.time() - self._last_read > self.idle_timeout:
+                        self._thread = None  # 誰も見ていないので止める
+                        return
+
+
+def partition_filter(partition):
+    """そのイベントの投稿とpartitionの無い従来の投稿だけを残す関数"""
+    def keep(post):
+        return post.get('partition') in (None, '', partition)
+    return keep
+
+
+def filter_response(data, keep):
+    """GASの応答（リストまたは {"posts": [...]} ）から投稿を絞り込む"""
+    if isinstance(data, dict):
+        return dict(data, posts=[post for post in data.get('posts', []) if keep(post)])
+    return [post for post in data if keep(post)]
+
+
+def partition_snapshot_path(snapshot_path, partition):
+    """イベントごとのスナップショットファイル名（post_snapshot.bin → post_snapshot.<id>.bin）"""
+    root, ext = os.path.splitext(snapshot_path)
+    return f"{root}.{re.sub(r'[^0-9A-Za-z_-]', '_', partition)}{ext}"
+
+
+class PartitionedPostStore:
+    """イベント（日付・ブース）ごとのSharedPostStoreをまとめたもの
+
+    ストアは表示されたイベントの分だけ作られ、同期・スナップショット・集計はイベントごとに行う。
+    idle_timeout秒見られていないイベントはポーリングを止めるため、過去のイベントを取り直し続けない。
+    fetchは fetch(partition, since)、version_fetchは version_fetch(partition)、
+    page_fetchは page_fetch(partition, limit) の形で呼ぶ。
+    """
+
+    def __init__(self, fetch, snapshot_path=None, idle_timeout=300, version_fetch=None, page_fetch=None,
+                 **store_options):
+        self.fetch = fetch
+        self.version_fetch = version_fetch
+        self.page_fetch = page_fetch
+        self._paging_unsupported = False  # 一度ページ非対応と分かったら、どのイベントでも以後問い合わせない
+        self.snapshot_path = snapshot_path
+        self.idle_timeout = idle_timeout
+        self.store_options = store_options
+        self._stores = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def store(self, partition):
+        """イベントのストア（初回は作成し、止まっていればポーリングを再開する）"""
+        store = self._stores.get(partition)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(partition)
+                if store is None:
+                    store = self._create(partition)
+                    self._stores[partition] = store
+        return store.start()
+
+    def _create(self, partition):
+        keep = partition_filter(partition)
+        store = SharedPostStore(
+            lambda since: filter_response(self.fetch(partition, since), keep),
+            snapshot_path=partition_snapshot_path(self.snapshot_path, partition) if self.snapshot_path else None,
+            idle_timeout=self.idle_timeout,
+            version_fetch=(lambda: self.version_fetch(partition)) if self.version_fetch else None,
+            page_fetch=(lambda limit: self._fetch_page(partition, limit, keep)) if self.page_fetch else None,
+            **self.store_options
+        )
+        for callback in self._subscribers:
+            store.subscribe(callback)
+        return store
+
+    def _fetch_page(self, partition, limit, keep):
+        if self._paging_unsupported:
+            return None
+        data = self.page_fetch(partition, limit)
+        if not (isinstance(data, dict) and 'next' in data):
+            self._paging_unsupported = True
+        return filter_response(data, keep)
+
+    def snapshot(self, partition):
+        return self.store(partition).snapshot()
+
+    def subscribe(self, callback):
+        """全イベント（これから作るものを含む）の同期結果を callback(posts) に渡す"""
+        with self._lock:
+            self._subscribers.append(callback)
+            stores = list(self._stores.values())
+        for store in stores:
+            store.subscribe(callback)
+
+    def request_refresh(self, partition=None):
+        """指定したイベント（省略時は作成済みの全イベント）をすぐ同期させる"""
+        if partition is None:
+            stores = list(self._stores.values())
+        else:
+            stores = [self._stores[partition]] if partition in self._stores else []
+        for store in stores:
+            store.request_refresh()
+
+    def active_partitions(self):
+        """ストアを作成済みのイベントID"""
+        return list(self._stores)
+
+
+def _is_next_version(current, new):
+    """データバージョン（数値または数値の文字列）newがcurrentのちょうど次か"""
+    try:
+        return int(new) == int(current) + 1
+    except (TypeError, ValueError):
+        return False
+
+
+class SingleFlightLoader:
+    """GASからの読み込みをプロセス内で1つにまとめるローダー（全セッション共有・スレッドセーフ）
+
+    get(key) はkeyが前回と変わったときだけ load() を呼ぶ。読み込み中に来た他の呼び出しは
+    待たずに前回の値を受け取る（最初の読み込みだけは完了を待つ）。
+    失敗した場合は前回の値を返し続け、retry_interval秒たつまで読み込み直さない。
+    """
+
+    def __init__(self, load, retry_interval=5.0):
+        self.load = load
+        self.retry_interval = retry_interval
+        self._key = None
+        self._value = None
+        self._loaded = False
+        self._loading = False
+        self._retry_at = 0.0
+        self._condition = threading.Condition()
+
+    def _is_fresh(self, key):
+        return self._loaded and (key == self._key or time.time() < self._retry_at)
+
+    def get(self, key):
+        with self._condition:
+            if self._is_fresh(key):
+                return self._value
+            if self._loading:
+                if self._loaded:
+                    return self._value  # 他の呼び出しが読み込み中なので前回の値を返す
+                self._condition.wait_for(lambda: not self._loading)
+                if self._loaded:
+                    return self._value
+            self._loading = True
+        try:
+            value = self.load()
+        except Exception:
+            with self._condition:
+                self._loading = False
+                self._retry_at = time.time() + self.retry_interval
+                self._condition.notify_all()
+                if self._loaded:
+                    return self._value
+            raise
+        with self._condition:
+            self._key = key
+            self._value = value
+            self._loaded = True
+            self._loading = False
+            self._retry_at = 0.0
+            self._condition.notify_all()
+        return value
+
+    def insert(self, item, key=None):
+        """読み込み済みの値（タプル）の末尾にitemを加える（自分の投稿を取り直さずに表示するため）
+
+        keyに投稿後のデータバージョンを指定すると、それが読み込み済みのkeyのちょうど次（+1）のときだけ
+        追加後の値をそのkeyの値として扱う。それ以外（他のレプリカの投稿・クリアが間にある）なら
+        追加したうえで、次のget()で読み込み直す。
+        """
+        with self._condition:
+            if not self._loaded:
+                return
+            self._value = tuple(self._value) + (item,)
+            if key is None:
+                return
+            if _is_next_version(self._key, key):
+                self._key = key
+            else:
+                self._key = object()  # どのkeyとも一致しない
+                self._retry_at = 0.0
+
+    def invalidate(self):
+        """次のget()で読み込み直す（それまでは前回の値を返す）"""
+        with self._condition:
+            self._key = object()  # どのkeyとも一致しない
+            self._retry_at = 0.0
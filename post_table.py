@@ -0,0 +1,142 @@
+"""投稿の列指向テーブル
+
+投稿（辞書のリスト）から集計・グラフ用の列を毎回作り直さないよう、
+スコアと時刻は数値配列、感情・モデル・色はカテゴリのコードとして保持する。
+追加は配列の末尾への書き込みだけで済み（容量は倍々で確保）、
+画面側には作成時点の件数で切り出したビュー（コピーなし）を渡す。
+"""
+import numpy as np
+import pandas as pd
+
+# カテゴリとして保持する列
+CATEGORY_COLUMNS = ('emotion', 'model_used', 'color')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class PostTableView:
+    """ある時点のテーブルの読み取り専用ビュー（配列はテーブルと共有）"""
+
+    def __init__(self, size, score, epoch, codes, categories, user, text):
+        self.size = size
+        self.score = score
+        self.epoch = epoch
+        self.codes = codes  # 列名 -> コード配列
+        self.categories = categories  # 列名 -> カテゴリ値のタプル
+        self.user = user
+        self.text = text
+
+    def __len__(self):
+        return self.size
+
+    def mean_score(self):
+        """平均スコア（投稿がなければ0）"""
+        return float(np.nanmean(self.score)) if self.size else 0.0
+
+    def count_score_at_least(self, threshold):
+        """スコアがthreshold以上の件数"""
+        return int(np.count_nonzero(self.score >= threshold))
+
+    def category_counts(self, column):
+        """カテゴリ列の件数（多い順のSeries、value_countsと同じ形）"""
+        categories = self.categories[column]
+        counts = np.bincount(self.codes[column], minlength=len(categories))
+        series = pd.Series(counts, index=list(categories), name='count')
+        return series[series > 0].sort_values(ascending=False)
+
+    def to_frame(self):
+        """グラフ用のDataFrame（数値列は配列をそのまま使う）"""
+        data = {
+            'sentiment': self.score,
+            'epoch': self.epoch,
+            'user': self.user,
+            'text': self.text,
+        }
+        for column in CATEGORY_COLUMNS:
+            data[column] = pd.Categorical.from_codes(self.codes[column], categories=list(self.categories[column]))
+        return pd.DataFrame(data, copy=False)
+
+
+class PostTable:
+    """追記型の列指向テーブル（ロックは呼び出し側で行う）"""
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._capacity = capacity
+        self._score = np.empty(capacity, dtype=np.float64)
+        self._epoch = np.empty(capacity, dtype=np.float64)
+        self._codes = {column: np.empty(capacity, dtype=np.int32) for column in CATEGORY_COLUMNS}
+        self._user = np.empty(capacity, dtype=object)
+        self._text = np.empty(capacity, dtype=object)
+        self._categories = {column: [] for column in CATEGORY_COLUMNS}
+        self._category_index = {column: {} for column in CATEGORY_COLUMNS}
+
+    @classmethod
+    def from_posts(cls, posts):
+        """投稿のリストからテーブルを作成"""
+        table = cls(capacity=max(1024, len(posts)))
+        table.extend(posts)
+        return table
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, required):
+        # 既存の配列は書き換えず新しい配列に移す（古いビューはそのまま使える）
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+        self._score = np.concatenate([self._score[:self._size], np.empty(capacity - self._size)])
+        self._epoch = np.concatenate([self._epoch[:self._size], np.empty(capacity - self._size)])
+        for column in CATEGORY_COLUMNS:
+            self._codes[column] = np.concatenate([
+                self._codes[column][:self._size],
+                np.empty(capacity - self._size, dtype=np.int32)
+            ])
+        self._user = np.concatenate([self._user[:self._size], np.empty(capacity - self._size, dtype=object)])
+        self._text = np.concatenate([self._text[:self._size], np.empty(capacity - self._size, dtype=object)])
+        self._capacity = capacity
+
+    def _code(self, column, value):
+        value = value if value is not None else ''
+        index = self._category_index[column]
+        code = index.get(value)
+        if code is None:
+            code = len(self._categories[column])
+            index[value] = code
+            self._categories[column].append(value)
+        return code
+
+    def extend(self, posts):
+        """投稿を末尾に追加（O(追加件数)）"""
+        if not posts:
+            return
+        start = self._size
+        end = start + len(posts)
+        if end > self._capacity:
+            self._grow(end)
+        self._score[start:end] = [_to_float(post.get('sentiment')) for post in posts]
+        self._epoch[start:end] = [post.get('epoch', np.nan) for post in posts]
+        for column in CATEGORY_COLUMNS:
+            self._codes[column][start:end] = [self._code(column, post.get(column)) for post in posts]
+        self._user[start:end] = [post.get('user', '') for post in posts]
+        self._text[start:end] = [post.get('text', '') for post in posts]
+        self._size = end
+
+    def view(self):
+        """現在の件数で切り出したビュー（後から追加された行は含まれない）"""
+        size = self._size
+        return PostTableView(
+            size,
+            self._score[:size],
+            self._epoch[:size],
+            {column: codes[:size] for column, codes in self._codes.items()},
+            {column: tuple(values) for column, values in self._categories.items()},
+            self._user[:size],
+            self._text[:size]
+        )
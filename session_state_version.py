@@ -2,34 +2,44 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
-import json
-
-# TextBlobのセットアップ
-try:
-    from textblob import TextBlob
-    try:
-        import nltk
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        try:
-            import ssl
-            try:
-                _create_unverified_https_context = ssl._create_unverified_context
-            except AttributeError:
-                pass
-            else:
-                ssl._create_default_https_context = _create_unverified_https_context
-            nltk.download('punkt', quiet=True)
-            nltk.download('brown', quiet=True)
-        except:
-            pass
-except ImportError:
-    st.error("TextBlobが利用できません。")
-    st.stop()
+import re
+from post_export import EXPORT_FORMATS, export_callable
 
 # ページ設定
 st.set_page_config(page_title="感情分析SNS", page_icon="🎭", layout="wide")
 
+# TextBlobが使えない環境向けの簡易英語辞書
+ENGLISH_POSITIVE_WORDS = {
+    'good', 'great', 'happy', 'fun', 'love', 'like', 'nice', 'best', 'amazing',
+    'awesome', 'excellent', 'wonderful', 'interesting', 'cool', 'glad', 'excited'
+}
+ENGLISH_NEGATIVE_WORDS = {
+    'bad', 'sad', 'boring', 'hate', 'worst', 'terrible', 'awful', 'tired',
+    'difficult', 'hard', 'worried', 'angry', 'poor', 'disappointed'
+}
+
+@st.cache_resource(show_spinner=False)
+def load_textblob():
+    """TextBlobを初回利用時に読み込み（結果はプロセス全体で共有）"""
+    # NLTKのダウンロードは行わない（オフライン環境で起動が止まるため）
+    try:
+        from textblob import TextBlob
+        # コーパス不足などで分析できない場合はフォールバックを使う
+        TextBlob("good").sentiment.polarity
+        return TextBlob
+    except Exception:
+        return None
+
+def simple_english_polarity(text):
+    """TextBlobが利用できない場合の簡易英語感情分析（-1〜1）"""
+    words = re.findall(r"[a-z']+", text.lower())
+    positive_count = sum(1 for word in words if word in ENGLISH_POSITIVE_WORDS)
+    negative_count = sum(1 for word in words if word in ENGLISH_NEGATIVE_WORDS)
+    total = positive_count + negative_count
+    if total == 0:
+        return 0
+    return (positive_count - negative_count) / total
+
 # Session Stateでデータを管理
 if 'posts' not in st.session_state:
     st.session_state.posts = []
@@ -48,33 +58,16 @@ def add_post(user_name, text, sentiment_score, emotion, color):
     st.session_state.posts.append(new_post)
     return True
 
-def export_data():
-    """データをJSON形式でエクスポート"""
-    if st.session_state.posts:
-        # datetimeを文字列に変換
-        export_data = []
-        for post in st.session_state.posts:
-            post_copy = post.copy()
-            post_copy['time'] = post['time'].isoformat()
-            export_data.append(post_copy)
-        
-        return json.dumps(export_data, ensure_ascii=False, indent=2)
-    return None
-
-def export_csv():
-    """データをCSV形式でエクスポート"""
-    if st.session_state.posts:
-        df = pd.DataFrame(st.session_state.posts)
-        return df.to_csv(index=False, encoding='utf-8')
-    return None
-
 def analyze_sentiment(text):
     """感情分析を実行"""
-    try:
-        blob = TextBlob(text)
-        sentiment_polarity = blob.sentiment.polarity
-    except:
-        sentiment_polarity = 0
+    text_blob = load_textblob()
+    if text_blob is not None:
+        try:
+            sentiment_polarity = text_blob(text).sentiment.polarity
+        except Exception:
+            sentiment_polarity = simple_english_polarity(text)
+    else:
+        sentiment_polarity = simple_english_polarity(text)
     
     # 日本語キーワード補正
     positive_words = ['楽しい', '嬉しい', '最高', '良い', 'すごい', 'がんばる', '頑張る', '感動', '素晴らしい', 'ありがとう', '大好き', '幸せ']
@@ -99,25 +92,17 @@ with st.sidebar:
     if st.session_state.posts:
         st.markdown(f"現在の投稿数: **{len(st.session_state.posts)}件**")
         
-        # JSONダウンロード
-        json_data = export_data()
-        if json_data:
-            st.download_button(
-                label="📄 JSONでダウンロード",
-                data=json_data,
-                file_name=f"emotion_posts_{datetime.now().strftime('%Y%m%d_%H%M')}.json",
-                mime="application/json"
-            )
-        
-        # CSVダウンロード
-        csv_data = export_csv()
-        if csv_data:
-            st.download_button(
-                label="📊 CSVでダウンロード",
-                data=csv_data,
-                file_name=f"emotion_posts_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                mime="text/csv"
-            )
+        # ダウンロード（ボタンが押されたときにだけファイルを作成）
+        export_format = st.selectbox(
+            "ファイル形式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0], key="export_format"
+        )
+        label, mime, extension = EXPORT_FORMATS[export_format]
+        st.download_button(
+            label=f"📄 {label}でダウンロード",
+            data=export_callable(st.session_state.posts, export_format),
+            file_name=f"emotion_posts_{datetime.now().strftime('%Y%m%d_%H%M')}{extension}",
+            mime=mime
+        )
         
         # データクリア
         if st.button("🗑️ 全データをクリア", type="secondary"):
@@ -0,0 +1,142 @@
+"""ローカル共有投稿のSQLiteストア（updated_app_code.py用）
+
+shared_posts.jsonを毎回全件読み書きする代わりに、1投稿を1行としてSQLiteに保存する。
+WALモードなので、書き込み中でも他のセッションは読み取りを続けられる。
+画面側は「最新N件」と集計だけを問い合わせ、全件の読み込みは行わない。
+保存期間を過ぎた投稿は archive_older_than でアーカイブ（post_archive.py）に移す。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+def _row_to_post(row):
+    post = dict(row)
+    post['time'] = datetime.fromisoformat(post['time'])
+    return post
+
+
+class SQLitePostStore:
+    """投稿の保存と問い合わせ（スレッドセーフ・複数プロセスからの書き込みも可）"""
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT NOT NULL,
+                text TEXT NOT NULL,
+                sentiment REAL NOT NULL,
+                emotion TEXT,
+                color TEXT,
+                time TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS posts_time ON posts (time)')
+        self._conn.commit()
+
+    def add(self, post):
+        """投稿を1件追加してidを返す（1トランザクションで確定する）"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO posts (user, text, sentiment, emotion, color, time) VALUES (?, ?, ?, ?, ?, ?)',
+                (post['user'], post['text'], post['sentiment'], post.get('emotion'), post.get('color'),
+                 post['time'].isoformat())
+            )
+        return cursor.lastrowid
+
+    def latest(self, limit=8):
+        """新しい順にlimit件"""
+        return self.page(limit)[0]
+
+    def page(self, limit, cursor=None):
+        """cursorより古い投稿を新しい順にlimit件と、次のページのcursor（最後ならNone）"""
+        with self._lock:
+            if cursor is None:
+                rows = self._conn.execute(
+                    'SELECT * FROM posts ORDER BY time DESC, id DESC LIMIT ?', (limit + 1,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    'SELECT * FROM posts WHERE (time, id) < (?, ?) ORDER BY time DESC, id DESC LIMIT ?',
+                    (cursor[0], cursor[1], limit + 1)
+                ).fetchall()
+        # 1件多く取得して次のページがあるかを判定する
+        next_cursor = (rows[limit - 1]['time'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return [_row_to_post(row) for row in rows[:limit]], next_cursor
+
+    def stats(self, positive_threshold=55):
+        """件数・平均スコア・ポジティブ件数"""
+        with self._lock:
+            total, average, positive = self._conn.execute(
+                'SELECT COUNT(*), AVG(sentiment), SUM(sentiment > ?) FROM posts', (positive_threshold,)
+            ).fetchone()
+        return {'total': total, 'average': average or 0.0, 'positive': positive or 0}
+
+    def emotion_counts(self):
+        """感情ごとの件数（多い順）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT emotion, COUNT(*) FROM posts GROUP BY emotion ORDER BY COUNT(*) DESC'
+            ).fetchall()
+        return {emotion: count for emotion, count in rows}
+
+    def sentiment_history(self):
+        """グラフ用の投稿順のスコア（本文などの表示に必要な列だけ）"""
+        with self._lock:
+            rows = self._conn.execute('SELECT user, text, sentiment FROM posts ORDER BY time, id').fetchall()
+        return [dict(row) for row in rows]
+
+    def migrate_json(self, json_path):
+        """既存のJSONファイルを一度だけ取り込み、取り込んだ件数を返す
+
+        取り込み後のファイルは「.migrated」を付けて残す（2回目以降は何もしない）。
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with self._lock:
+            # 書き込みロックを取ってから確認し、複数プロセスで二重に取り込まないようにする
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if not os.path.exists(json_path):
+                    self._conn.rollback()
+                    return 0
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    posts = json.load(f)
+                self._conn.executemany(
+                    'INSERT INTO posts (user, text, sentiment, emotion, color, time) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(p['user'], p['text'], p['sentiment'], p.get('emotion'), p.get('color'), p['time'])
+                     for p in posts]
+                )
+                os.replace(json_path, json_path + '.migrated')
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(posts)
+
+    def archive_older_than(self, cutoff, archive):
+        """cutoff（datetime）より前の投稿をarchive（PostArchive）に移して削除し、移した件数を返す"""
+        with self._lock:
+            # 書き込みロックを取ってから選ぶ（複数プロセスで同じ投稿を二重に移さない）
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT * FROM posts WHERE time < ? ORDER BY time, id', (cutoff.isoformat(),)
+                ).fetchall()
+                if rows:
+                    # 先にアーカイブへ書き込んでから削除する（途中で止まっても失われない）
+                    archive.append(dict(row) for row in rows)
+                    self._conn.execute('DELETE FROM posts WHERE time < ?', (cutoff.isoformat(),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(rows)
@@ -0,0 +1,51 @@
+"""重複チェック用インデックス（dedup_index.py）のテスト"""
+import pickle
+
+from dedup_index import PostDedupIndex
+
+
+def test_contains_after_add_and_not_before(tmp_path):
+    index = PostDedupIndex(str(tmp_path / 'dedup.bin'), capacity=1000)
+    assert not index.contains('h1')
+    index.add('h1')
+    assert index.contains('h1')
+
+
+def test_old_hashes_are_still_found_through_the_bloom_filter(tmp_path):
+    index = PostDedupIndex(str(tmp_path / 'dedup.bin'), capacity=1000, recent_size=2)
+    index.add_many(f'h{i}' for i in range(10))
+    assert index.stats()['recent'] == 2
+    assert index.contains('h0')
+    assert index.stats()['probable_hits'] == 1
+
+
+def test_rebuild_forgets_cleared_hashes(tmp_path):
+    index = PostDedupIndex(str(tmp_path / 'dedup.bin'), capacity=1000)
+    index.add_many(['cleared', 'kept'])
+    index.rebuild(['kept'])
+    assert index.contains('kept')
+    assert not index.contains('cleared')
+
+
+def test_saved_index_is_loaded_on_restart(tmp_path):
+    path = str(tmp_path / 'dedup.bin')
+    index = PostDedupIndex(path, capacity=1000, recent_size=3)
+    index.add_many(f'h{i}' for i in range(10))
+    index.save()
+
+    restarted = PostDedupIndex(path, capacity=1000, recent_size=3)
+    assert restarted.stats()['total'] == 10
+    assert restarted.stats()['recent'] == 3
+    assert all(restarted.contains(f'h{i}') for i in range(10))
+
+
+def test_file_with_other_parameters_or_format_is_ignored(tmp_path):
+    path = str(tmp_path / 'dedup.bin')
+    index = PostDedupIndex(path, capacity=1000)
+    index.add('h1')
+    index.save()
+    assert not PostDedupIndex(path, capacity=2000).contains('h1')
+
+    with open(path, 'wb') as f:
+        pickle.dump({'bloom': None, 'recent': ['h1']}, f)  # 以前の形式のファイル
+    assert not PostDedupIndex(path, capacity=1000).contains('h1')
@@ -0,0 +1,52 @@
+"""TextBlob版アプリの起動時間のテスト
+
+初回実行（コールドスタート）でTextBlob / NLTKを読み込まず、
+ダウンロードなしで一定時間内に画面を作れることを確認する。
+AppTestで別プロセスから実行する（sys.modulesを汚さないため）。
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# streamlit自体のimportを除いた、初回の画面作成にかける時間の上限（秒）
+IMPORT_BUDGET_SECONDS = 5.0
+
+RUNNER = """
+import json, sys, time
+import streamlit  # streamlit自体の読み込みは計測に含めない
+from streamlit.testing.v1 import AppTest
+
+started = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'elapsed': elapsed,
+    'exceptions': [e.value for e in at.exception],
+    'textblob': 'textblob' in sys.modules,
+    'nltk': 'nltk' in sys.modules,
+}))
+"""
+
+
+@pytest.mark.parametrize('script', ['updated_app_code.py', 'session_state_version.py'])
+def test_cold_start_within_budget(script, tmp_path):
+    result = subprocess.run(
+        [sys.executable, '-c', RUNNER, os.path.join(REPO_DIR, script)],
+        cwd=tmp_path,  # 共有投稿ファイルなどは一時ディレクトリに作る
+        env=dict(os.environ, PYTHONPATH=REPO_DIR),
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report['exceptions'] == []
+    # TextBlobは初回の分析まで読み込まない（NLTKのデータ確認・ダウンロードも行わない）
+    assert not report['textblob']
+    assert not report['nltk']
+    assert report['elapsed'] < IMPORT_BUDGET_SECONDS
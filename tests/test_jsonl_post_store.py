@@ -0,0 +1,98 @@
+"""追記型ログストア（jsonl_post_store.py）のテスト
+
+コンパクションと追記が同時に起きても、途中で止まっても、投稿が失われず重複もしないことを確認する。
+"""
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+from jsonl_post_store import JsonlPostStore
+
+START = datetime(2025, 8, 16, 10, 0, 0)
+
+
+def make_post(i):
+    return {'user': f'u{i}', 'text': f'感想{i}', 'sentiment': 60, 'emotion': '🙂 満足',
+            'time': START + timedelta(seconds=i)}
+
+
+def all_texts(store):
+    posts, cursor = store.page(1000)
+    assert cursor is None
+    return sorted(post['text'] for post in posts)
+
+
+def test_compaction_racing_appends_keeps_every_post_once(tmp_path):
+    path = str(tmp_path / 'shared_posts.jsonl')
+    JsonlPostStore(path)
+    writers, per_writer = 4, 50
+    stop = threading.Event()
+
+    def write(writer):
+        store = JsonlPostStore(path)  # プロセスごとに別のストアを持つのと同じ
+        for i in range(per_writer):
+            store.add(make_post(writer * per_writer + i))
+
+    def compact():
+        store = JsonlPostStore(path)
+        while not stop.is_set():
+            store.compact()
+
+    compactor = threading.Thread(target=compact)
+    compactor.start()
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    stop.set()
+    compactor.join(30)
+
+    expected = sorted(f'感想{i}' for i in range(writers * per_writer))
+    assert all_texts(JsonlPostStore(path)) == expected
+    JsonlPostStore(path).compact()
+    assert all_texts(JsonlPostStore(path)) == expected
+
+
+def test_reader_follows_compaction(tmp_path):
+    path = str(tmp_path / 'shared_posts.jsonl')
+    reader = JsonlPostStore(path)
+    writer = JsonlPostStore(path)
+    for i in range(3):
+        writer.add(make_post(i))
+    assert reader.stats()['total'] == 3
+
+    writer.compact()
+    writer.add(make_post(3))
+    assert all_texts(reader) == [f'感想{i}' for i in range(4)]
+
+
+def test_posts_appended_after_an_interrupted_compaction_are_kept(tmp_path):
+    path = str(tmp_path / 'shared_posts.jsonl')
+    store = JsonlPostStore(path)
+    for i in range(3):
+        store.add(make_post(i))
+    # スナップショットとインデックスを書いた後、ログを空にする前に止まった状態を作る
+    shutil.copy(path, path + '.before')
+    store.compact()
+    shutil.copy(path + '.before', path)
+
+    for i in range(3, 5):
+        store.add(make_post(i))
+    expected = [f'感想{i}' for i in range(5)]
+    assert all_texts(JsonlPostStore(path)) == expected  # 後から起動した読み込み側
+    assert all_texts(store) == expected
+
+    store.compact()
+    assert all_texts(JsonlPostStore(path)) == expected
+
+
+def test_page_cursor_survives_compaction(tmp_path):
+    path = str(tmp_path / 'shared_posts.jsonl')
+    store = JsonlPostStore(path)
+    for i in range(6):
+        store.add(make_post(i))
+    first, cursor = store.page(3)
+    store.compact()
+    second, _ = store.page(3, cursor)
+    assert [post['text'] for post in first + second] == [f'感想{i}' for i in reversed(range(6))]
@@ -0,0 +1,103 @@
+"""送信待ちキュー（outbox.py）のテスト
+
+再送・冪等キー・再起動後の送信再開を、GASの代わりの送信関数で確認する。
+"""
+from outbox import PENDING, SENT, PostOutbox
+
+
+def make_post(text, **extra):
+    return dict({'user': 'taro', 'text': text, 'sentiment': 70, 'hash': f'h-{text}'}, **extra)
+
+
+class FlakySender:
+    """最初のfailures回は例外を投げ、その後は受け取ったpost_idをすべて送信済みとして返す"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, posts):
+        self.batches.append([post['post_id'] for post in posts])
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('GASに接続できません')
+        return [post['post_id'] for post in posts]
+
+
+def test_failed_batch_is_retried_until_sent(tmp_path):
+    sender = FlakySender(failures=2)
+    outbox = PostOutbox(str(tmp_path / 'outbox.sqlite3'), sender)
+    post_id = outbox.submit(make_post('楽しかった'))
+
+    for _ in range(2):
+        try:
+            outbox.flush_once()
+        except RuntimeError:
+            pass
+    status, attempts, last_error = outbox.status([post_id])[post_id]
+    assert (status, attempts) == (PENDING, 2)
+    assert 'GASに接続できません' in last_error
+
+    assert outbox.flush_once() == 1
+    assert outbox.status([post_id])[post_id][0] == SENT
+    assert sender.batches == [[post_id]] * 3
+    assert outbox.flush_once() == 0  # 送信済みは再送しない
+
+
+def test_partial_delivery_keeps_the_rest_pending(tmp_path):
+    outbox = PostOutbox(str(tmp_path / 'outbox.sqlite3'), lambda posts: [posts[0]['post_id']])
+    first = outbox.submit(make_post('1件目'))
+    second = outbox.submit(make_post('2件目'))
+
+    try:
+        outbox.flush_once()
+    except RuntimeError:
+        pass
+    statuses = outbox.status([first, second])
+    assert statuses[first][0] == SENT
+    assert statuses[second][0] == PENDING
+    assert [post['post_id'] for post in outbox.pending_posts()] == [second]
+
+
+def test_resubmitting_the_same_post_id_is_idempotent(tmp_path):
+    sender = FlakySender()
+    outbox = PostOutbox(str(tmp_path / 'outbox.sqlite3'), sender)
+    post_id = outbox.submit(make_post('楽しかった', post_id='fixed-id'))
+    assert outbox.submit(make_post('楽しかった', post_id='fixed-id')) == post_id
+
+    assert outbox.counts() == {PENDING: 1}
+    outbox.flush_once()
+    # 送信済みになった後に同じpost_idを受け付けても、もう一度は送らない
+    outbox.submit(make_post('楽しかった', post_id='fixed-id'))
+    assert outbox.flush_once() == 0
+    assert sender.batches == [['fixed-id']]
+
+
+def test_pending_posts_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'outbox.sqlite3')
+    before = PostOutbox(path, FlakySender(failures=1))
+    post_id = before.submit(make_post('再起動前'))
+    try:
+        before.flush_once()
+    except RuntimeError:
+        pass
+
+    # 同じファイルで作り直す（プロセスの再起動）
+    sender = FlakySender()
+    after = PostOutbox(path, sender)
+    assert [post['post_id'] for post in after.pending_posts()] == [post_id]
+    assert after.status([post_id])[post_id][1] == 1  # 試行回数も残っている
+    assert after.flush_once() == 1
+    assert sender.batches == [[post_id]]
+    assert after.counts() == {SENT: 1}
+
+
+def test_prune_sent_removes_only_old_delivered_rows(tmp_path):
+    outbox = PostOutbox(str(tmp_path / 'outbox.sqlite3'), FlakySender(), sent_retention=3600)
+    sent_id = outbox.submit(make_post('送信済み'))
+    outbox.flush_once()
+    pending_id = outbox.submit(make_post('未送信'))
+
+    assert outbox.prune_sent() == 0  # 保存期間内
+    assert outbox.prune_sent(older_than=-1) == 1
+    assert set(outbox.status([sent_id, pending_id])) == {pending_id}
@@ -0,0 +1,166 @@
+"""共有ストア（post_store.py）のテスト
+
+同期中のクリア、送信待ちの投稿、SingleFlightLoaderの読み込みのまとめ方と失敗時の待機を確認する。
+"""
+import threading
+import time
+
+import pytest
+
+from post_store import PostCollection, SharedPostStore, SingleFlightLoader
+
+
+def make_post(i, **extra):
+    return dict({
+        'user': f'u{i}', 'text': f'感想{i}', 'sentiment': 60,
+        'time': f'2025-08-16T10:00:{i:02d}Z', 'hash': f'h{i}'
+    }, **extra)
+
+
+# --- SharedPostStore ---
+
+def test_clear_during_an_inflight_sync_discards_the_stale_result():
+    fetch_started = threading.Event()
+    release_fetch = threading.Event()
+
+    def fetch(since):
+        fetch_started.set()
+        release_fetch.wait(5)
+        return [make_post(1), make_post(2)]  # クリア前の内容
+
+    store = SharedPostStore(fetch)
+    syncing = threading.Thread(target=store.sync_once)
+    syncing.start()
+    assert fetch_started.wait(5)
+
+    store.reset()  # 取得中にクリア
+    release_fetch.set()
+    syncing.join(5)
+
+    assert store.snapshot().posts == ()
+    assert len(store.collection) == 0
+
+
+def test_sync_after_a_clear_publishes_new_posts():
+    responses = [[make_post(1)], [make_post(2)]]
+    store = SharedPostStore(lambda since: responses.pop(0))
+    store.sync_once()
+    store.reset()
+    store.sync_once()
+    assert [post['hash'] for post in store.snapshot().posts] == ['h2']
+
+
+def test_pending_post_is_replaced_when_gas_returns_it():
+    store = SharedPostStore(lambda since: [make_post(1)])
+    store.add_pending(make_post(1))
+    assert [post.pending for post in store.snapshot().posts] == [True]
+
+    store.sync_once()
+    assert [post.pending for post in store.snapshot().posts] == [False]
+
+
+def test_pending_post_missing_from_gas_expires_after_ttl():
+    collection = PostCollection(pending_ttl=0.05)
+    collection.add_pending(make_post(1))
+    collection.replace_all([make_post(2)])
+    assert sorted(post['hash'] for post in collection.posts()) == ['h1', 'h2']
+
+    time.sleep(0.1)
+    collection.replace_all([make_post(2)])
+    assert [post['hash'] for post in collection.posts()] == ['h2']
+
+
+# --- SingleFlightLoader ---
+
+def test_concurrent_first_loads_are_coalesced():
+    calls = []
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return ('post',)
+
+    loader = SingleFlightLoader(load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(loader.get(1))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [('post',)] * 5
+
+
+def test_callers_get_the_previous_value_while_a_reload_is_running():
+    release = threading.Event()
+    values = iter([('old',), ('new',)])
+
+    def load():
+        value = next(values)
+        if value == ('new',):
+            release.wait(5)
+        return value
+
+    loader = SingleFlightLoader(load)
+    assert loader.get(1) == ('old',)
+    reloading = threading.Thread(target=loader.get, args=(2,))
+    reloading.start()
+    time.sleep(0.05)
+    assert loader.get(2) == ('old',)  # 読み込み中は待たない
+    release.set()
+    reloading.join(5)
+    assert loader.get(2) == ('new',)
+
+
+def test_failed_load_keeps_the_old_value_and_backs_off():
+    calls = []
+    failing = [False]
+
+    def load():
+        calls.append(1)
+        if failing[0]:
+            raise ConnectionError('GASに接続できません')
+        return ('post',)
+
+    loader = SingleFlightLoader(load, retry_interval=0.2)
+    loader.get(1)
+    failing[0] = True
+    assert loader.get(2) == ('post',)
+    assert loader.get(3) == ('post',)  # retry_interval秒たつまでは読み込み直さない
+    assert len(calls) == 2
+
+    time.sleep(0.25)
+    failing[0] = False
+    assert loader.get(3) == ('post',)
+    assert len(calls) == 3
+
+
+def test_failed_first_load_raises():
+    def load():
+        raise ConnectionError('GASに接続できません')
+
+    with pytest.raises(ConnectionError):
+        SingleFlightLoader(load).get(1)
+
+
+def test_insert_adopts_only_the_next_version():
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ('a',)
+
+    loader = SingleFlightLoader(load)
+    loader.get('5')
+    loader.insert('b', key='6')
+    assert loader.get('6') == ('a', 'b')
+    assert len(calls) == 1
+
+    # 間に他のレプリカの書き込みがある（バージョンが2以上進んだ）なら取り直す
+    loader.insert('c', key='8')
+    assert loader.get('8') == ('a',)
+    assert len(calls) == 2
@@ -2,96 +2,102 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
-import json
-import os
 import time
-
-# TextBlobのセットアップ（Streamlit Cloudでも動作するように）
-try:
-    from textblob import TextBlob
-    # NLTKデータの初期化を試行
-    try:
-        import nltk
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        try:
-            import ssl
-            try:
-                _create_unverified_https_context = ssl._create_unverified_context
-            except AttributeError:
-                pass
-            else:
-                ssl._create_default_https_context = _create_unverified_https_context
-            nltk.download('punkt', quiet=True)
-            nltk.download('brown', quiet=True)
-        except:
-            pass
-except ImportError:
-    st.error("TextBlobが利用できません。requirements.txtを確認してください。")
-    st.stop()
+import re
+from jsonl_post_store import JsonlPostStore
+from post_archive import PostArchive, start_archiver
+from sqlite_post_store import SQLitePostStore
 
 # ページ設定
 st.set_page_config(page_title="感情分析SNS", page_icon="🎭", layout="wide")
 
-# 共有データファイルのパス
-DATA_FILE = "shared_posts.json"
+# TextBlobが使えない環境向けの簡易英語辞書
+ENGLISH_POSITIVE_WORDS = {
+    'good', 'great', 'happy', 'fun', 'love', 'like', 'nice', 'best', 'amazing',
+    'awesome', 'excellent', 'wonderful', 'interesting', 'cool', 'glad', 'excited'
+}
+ENGLISH_NEGATIVE_WORDS = {
+    'bad', 'sad', 'boring', 'hate', 'worst', 'terrible', 'awful', 'tired',
+    'difficult', 'hard', 'worried', 'angry', 'poor', 'disappointed'
+}
 
-def load_shared_posts():
-    """共有投稿データを読み込み"""
+@st.cache_resource(show_spinner=False)
+def load_textblob():
+    """TextBlobを初回利用時に読み込み（結果はプロセス全体で共有）"""
+    # NLTKのダウンロードは行わない（オフライン環境で起動が止まるため）
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # datetime文字列をdatetimeオブジェクトに変換
-                for post in data:
-                    post['time'] = datetime.fromisoformat(post['time'])
-                return data
-        else:
-            return []
-    except Exception as e:
-        st.error(f"データ読み込みエラー: {e}")
-        return []
+        from textblob import TextBlob
+        # コーパス不足などで分析できない場合はフォールバックを使う
+        TextBlob("good").sentiment.polarity
+        return TextBlob
+    except Exception:
+        return None
 
-def save_shared_posts(posts):
-    """共有投稿データを保存"""
-    try:
-        # datetimeオブジェクトを文字列に変換
-        data_to_save = []
-        for post in posts:
-            post_copy = post.copy()
-            post_copy['time'] = post['time'].isoformat()
-            data_to_save.append(post_copy)
-        
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"データ保存エラー: {e}")
-        return False
+def simple_english_polarity(text):
+    """TextBlobが利用できない場合の簡易英語感情分析（-1〜1）"""
+    words = re.findall(r"[a-z']+", text.lower())
+    positive_count = sum(1 for word in words if word in ENGLISH_POSITIVE_WORDS)
+    negative_count = sum(1 for word in words if word in ENGLISH_NEGATIVE_WORDS)
+    total = positive_count + negative_count
+    if total == 0:
+        return 0
+    return (positive_count - negative_count) / total
+
+# 共有データのパス（JSONファイルは旧形式。初回起動時に新しい保存先へ取り込む）
+DATA_FILE = "shared_posts.json"
+DB_FILE = "shared_posts.sqlite3"
+LOG_FILE = "shared_posts.jsonl"
+
+# 保存方式: "sqlite"（SQLite） または "jsonl"（追記型のテキストログ）
+STORAGE_BACKEND = "sqlite"
+
+# 保存期間（日）を過ぎた投稿は1時間ごとにアーカイブ（投稿日ごとの圧縮ファイル）へ移す
+ARCHIVE_DIR = "post_archive"
+RETENTION_DAYS = 7
+
+@st.cache_resource
+def get_post_archive():
+    """過去の投稿のアーカイブ（全セッション共有）"""
+    return PostArchive(ARCHIVE_DIR)
+
+@st.cache_resource
+def get_post_store():
+    """共有投稿のストア（全セッション共有）"""
+    if STORAGE_BACKEND == "jsonl":
+        store = JsonlPostStore(LOG_FILE).start_compaction()
+    else:
+        store = SQLitePostStore(DB_FILE)
+    store.migrate_json(DATA_FILE)
+    start_archiver(store, get_post_archive(), retention_days=RETENTION_DAYS)
+    return store
 
 def add_post(user_name, text, sentiment_score, emotion, color):
     """新しい投稿を追加"""
-    posts = load_shared_posts()
     new_post = {
         'user': user_name,
         'text': text,
         'sentiment': sentiment_score,
         'emotion': emotion,
         'time': datetime.now(),
-        'color': color,
-        'id': len(posts) + 1
+        'color': color
     }
-    posts.append(new_post)
-    return save_shared_posts(posts)
+    try:
+        get_post_store().add(new_post)
+        return True
+    except Exception as e:
+        st.error(f"データ保存エラー: {e}")
+        return False
 
 def analyze_sentiment(text):
     """感情分析を実行（エラーハンドリング付き）"""
-    try:
-        blob = TextBlob(text)
-        sentiment_polarity = blob.sentiment.polarity
-    except:
-        # TextBlobが失敗した場合は簡易分析のみ
-        sentiment_polarity = 0
+    text_blob = load_textblob()
+    if text_blob is not None:
+        try:
+            sentiment_polarity = text_blob(text).sentiment.polarity
+        except Exception:
+            sentiment_polarity = simple_english_polarity(text)
+    else:
+        sentiment_polarity = simple_english_polarity(text)
     
     # 日本語の場合の簡易感情分析補正
     positive_words = ['楽しい', '嬉しい', '最高', '良い', 'すごい', 'がんばる', '頑張る', '感動', '素晴らしい', 'ありがとう', '大好き', '幸せ']
@@ -181,21 +187,28 @@ with col1:
             else:
                 st.error("投稿に失敗しました。もう一度お試しください。")
 
-with col2:
+def show_more_posts(feed_limit):
+    """「もっと見る」: 表示件数を増やす（クリック後のフラグメントの再実行で反映される）"""
+    st.session_state.feed_limit = feed_limit + 8
+
+# 自動更新ではタイムラインのフラグメントだけを5秒ごとに再実行する（入力中のフォームは中断しない）
+@st.fragment(run_every=5 if auto_refresh else None)
+def show_timeline():
+    """統計・タイムライン・グラフ"""
     st.subheader("🌟 みんなの投稿タイムライン")
     
-    # 手動更新ボタン
-    if st.button("🔄 最新を取得"):
-        st.rerun()
+    # 手動更新ボタン（押すとタイムラインだけが再実行される）
+    st.button("🔄 最新を取得")
     
-    # 共有投稿を読み込み
-    all_posts = load_shared_posts()
+    # 共有投稿の集計を読み込み（全件は読み込まない）
+    post_store = get_post_store()
+    post_stats = post_store.stats()
     
     # 投稿がある場合のみ表示
-    if all_posts:
+    if post_stats['total']:
         # 統計情報
-        total_posts = len(all_posts)
-        avg_sentiment = sum(post['sentiment'] for post in all_posts) / total_posts
+        total_posts = post_stats['total']
+        avg_sentiment = post_stats['average']
         
         st.markdown("### 📊 リアルタイム統計")
         
@@ -206,19 +219,19 @@ with col2:
         with metric_col2:
             st.metric("平均感情", f"{avg_sentiment:.1f}点")
         with metric_col3:
-            positive_ratio = len([p for p in all_posts if p['sentiment'] > 55]) / total_posts * 100
+            positive_ratio = post_stats['positive'] / total_posts * 100
             st.metric("ポジティブ率", f"{positive_ratio:.0f}%")
         
         # 最新投稿の通知
-        if total_posts > 0:
-            latest_post = all_posts[-1]
-            time_diff = datetime.now() - latest_post['time']
-            if time_diff.total_seconds() < 30:  # 30秒以内の投稿
-                st.success(f"🔥 新着: {latest_post['user']}さんが投稿しました！")
+        feed_limit = st.session_state.get('feed_limit', 8)
+        display_posts, next_cursor = post_store.page(feed_limit)
+        latest_post = display_posts[0]
+        time_diff = datetime.now() - latest_post['time']
+        if time_diff.total_seconds() < 30:  # 30秒以内の投稿
+            st.success(f"🔥 新着: {latest_post['user']}さんが投稿しました！")
         
-        # タイムライン表示（最新から8件）
+        # タイムライン表示（最新から8件、「もっと見る」で追加）
         st.markdown("### 💬 最新の投稿")
-        display_posts = sorted(all_posts, key=lambda x: x['time'], reverse=True)[:8]
         
         for post in display_posts:
             time_ago = datetime.now() - post['time']
@@ -252,10 +265,13 @@ with col2:
                 </div>
                 """, unsafe_allow_html=True)
         
+        if next_cursor is not None:
+            st.button("⬇️ もっと見る", on_click=show_more_posts, args=(feed_limit,))
+        
         # 感情推移グラフ
-        if len(all_posts) > 1:
+        if total_posts > 1:
             st.markdown("### 📈 感情の推移（全体）")
-            df = pd.DataFrame(all_posts)
+            df = pd.DataFrame(post_store.sentiment_history())
             df['投稿順序'] = range(1, len(df) + 1)
             
             fig = px.line(
@@ -277,18 +293,16 @@ with col2:
             
             # 感情分布
             st.markdown("### 🎭 感情分布")
-            emotion_counts = pd.DataFrame(all_posts)['emotion'].value_counts()
-            fig2 = px.pie(values=emotion_counts.values, names=emotion_counts.index, 
+            emotion_counts = post_store.emotion_counts()
+            fig2 = px.pie(values=list(emotion_counts.values()), names=list(emotion_counts.keys()), 
                          title="投稿の感情分布")
             st.plotly_chart(fig2, use_container_width=True)
     
     else:
         st.info("まだ投稿がありません。左側から投稿してみてください！")
 
-# 自動更新機能
-if auto_refresh:
-    time.sleep(5)
-    st.rerun()
+with col2:
+    show_timeline()
 
 # サイドバーに情報
 with st.sidebar:
@@ -317,9 +331,33 @@ with st.sidebar:
     """)
     
     # 現在のデータ状況
-    current_posts = load_shared_posts()
+    current_posts = get_post_store().latest(1)
     st.markdown(f"### 📊 現在の状況")
-    st.markdown(f"**総投稿数**: {len(current_posts)}件")
+    st.markdown(f"**総投稿数**: {get_post_store().stats()['total']}件")
     if current_posts:
-        latest = current_posts[-1]
+        latest = current_posts[0]
         st.markdown(f"**最新投稿**: {latest['user']}さん")
+    
+    # 保存期間を過ぎた投稿（管理者用。開いたときだけアーカイブを読む）
+    st.markdown("### 🗄️ 過去の投稿（管理者用）")
+    if st.toggle("アーカイブを表示", key="show_archive"):
+        archive = get_post_archive()
+        segments = archive.segments()
+        st.caption(
+            f"{RETENTION_DAYS}日より前の投稿を保存 / {len(segments)}日分・"
+            f"{sum(size for _, size in segments) / 1024:.1f}KB（圧縮後）"
+        )
+        if segments:
+            days = [day for day, _ in segments]
+            start_day = st.selectbox("開始日", days[::-1], key="archive_start")
+            end_day = st.selectbox("終了日", days, key="archive_end")
+            keyword = st.text_input("キーワード", key="archive_keyword")
+            archived_posts = archive.query(start_day, end_day, keyword=keyword or None)
+            st.caption(f"{len(archived_posts)}件（新しい順・最大500件）")
+            if archived_posts:
+                st.dataframe(
+                    pd.DataFrame(archived_posts)[['time', 'user', 'text', 'sentiment', 'emotion']],
+                    hide_index=True
+                )
+        else:
+            st.info("アーカイブされた投稿はまだありません")